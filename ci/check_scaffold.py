@@ -39,6 +39,8 @@ REQUIRED_FILES = [
     Path("pipeline/config.py"),
     Path("pipeline/engine.py"),
     Path("pipeline/preprocess.py"),
+    Path("pipeline/feature_cache.py"),
+    Path("pipeline/npy_io.py"),
     Path("pipeline/image_io.py"),
     Path("pipeline/vit.py"),
     Path("pipeline/generator.py"),
@@ -66,6 +66,8 @@ def main() -> int:
         required = [
             workspace / "audio_features.npy",
             workspace / "mouth_landmarks.json",
+            workspace / "mouth_landmarks.npy",
+            workspace / "voice_activity.json",
             workspace / "frames",
             workspace / "output.mp4",
             workspace / "pipeline_run.json",
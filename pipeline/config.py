@@ -8,6 +8,18 @@ class PreprocessConfig:
     window_ms: float = 25.0
     hop_ms: float = 10.0
     landmark_frames: int = 12
+    feature_engine: str = "auto"
+    audio_input_mode: str = "stream"
+    feature_fps: int | None = None
+    workers: int = 1
+    analysis_rate: int | None = None
+    feature_set: str = "basic"
+    n_mels: int = 40
+    feature_quantization: str = "none"
+    feature_cache_dir: str | None = None
+    feature_cache_max_bytes: int = 1 << 30
+    vad_rms_threshold: float = 0.01
+    vad_min_silent_rows: int = 3
 
 
 @dataclass(frozen=True)
@@ -16,6 +28,7 @@ class GeneratorConfig:
     backend: str = "heuristic"
     vit_reference_dir: str | None = None
     vit_reference_limit: int = 8
+    vit_decode_workers: int = 4
     vit_patch_size: int = 16
     vit_image_size: int = 224
     vit_fallback_mock: bool = True
@@ -30,6 +43,10 @@ class GeneratorConfig:
     vit_overfit_guard_strength: float = 0.0
     temporal_spatial_loss_weight: float = 0.0
     temporal_smooth_factor: float = 0.35
+    reuse_silent_frames: bool = False
+    image_cache_max_bytes: int = 64 << 20
+    image_sidecar_dir: str | None = None
+    image_sidecar_max_bytes: int = 1 << 30
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+FEATURE_CACHE_VERSION = "v1"
+DEFAULT_FEATURE_CACHE_MAX_BYTES = 1 << 30
+_HASH_CHUNK_BYTES = 1 << 20
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while True:
+            chunk = handle.read(_HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def replace_cache_entry(entry: Path) -> Iterator[Path]:
+    """Yield a private temp path beside ``entry``; it replaces ``entry`` if the block succeeds.
+
+    Readers never see a partial entry, and the cache never shares an inode with a workspace
+    file that may be rewritten later.
+    """
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        yield Path(tmp_name)
+        os.replace(tmp_name, entry)
+    finally:
+        Path(tmp_name).unlink(missing_ok=True)
+
+
+def evict_oldest_entries(root: Path, pattern: str, max_bytes: int) -> int:
+    """Unlink the least recently touched ``root/pattern`` files until the rest fit in ``max_bytes``."""
+    entries: list[tuple[int, int, Path]] = []
+    for path in root.glob(pattern):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        evicted += 1
+    return evicted
+
+
+def feature_cache_key(audio_digest: str, params: dict[str, object]) -> str:
+    payload = json.dumps(
+        {"version": FEATURE_CACHE_VERSION, "audio_sha256": audio_digest, "params": params},
+        ensure_ascii=True,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FeatureCache:
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_FEATURE_CACHE_MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.npy"
+
+    def fetch(self, key: str, destination: Path) -> bool:
+        entry = self.entry_path(key)
+        if not entry.is_file():
+            return False
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.unlink(missing_ok=True)
+        try:
+            os.link(entry, destination)
+        except FileNotFoundError:
+            # Evicted by a concurrent job between the check and the link.
+            return False
+        except OSError:
+            try:
+                shutil.copyfile(entry, destination)
+            except FileNotFoundError:
+                return False
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def store(self, key: str, source: Path) -> int:
+        with replace_cache_entry(self.entry_path(key)) as tmp_path:
+            shutil.copyfile(source, tmp_path)
+        return self.evict()
+
+    def evict(self) -> int:
+        return evict_oldest_entries(self.root, "*/*.npy", self.max_bytes)
@@ -1,44 +1,21 @@
 from __future__ import annotations
 
 import json
-import re
+import os
+import shutil
 import struct
+import sys
+import time
 import zlib
+from array import array
 from pathlib import Path
 
+from pipeline.interfaces import landmark_track_path
+from pipeline.npy_io import open_npy_f32_rows, read_npy_f32_matrix, read_npy_header  # noqa: F401 - re-exported
 from pipeline.preprocess import get_image_size
 from pipeline.vit import VitConditioning, resolve_vit_conditioning
 
 
-def read_npy_f32_matrix(path: Path) -> list[list[float]]:
-    raw = path.read_bytes()
-    if not raw.startswith(b"\x93NUMPY"):
-        raise ValueError(f"Invalid NPY header: {path}")
-
-    major = raw[6]
-    minor = raw[7]
-    if (major, minor) != (1, 0):
-        raise ValueError(f"Unsupported NPY version: {(major, minor)}")
-
-    header_len = int.from_bytes(raw[8:10], "little")
-    header = raw[10 : 10 + header_len].decode("latin1")
-    shape_match = re.search(r"'shape': \((\d+), (\d+)\)", header)
-    if not shape_match:
-        raise ValueError(f"NPY shape missing: {path}")
-    rows = int(shape_match.group(1))
-    cols = int(shape_match.group(2))
-
-    offset = 10 + header_len
-    count = rows * cols
-    if count == 0:
-        return []
-    values = struct.unpack("<" + ("f" * count), raw[offset : offset + (4 * count)])
-    matrix: list[list[float]] = []
-    for i in range(rows):
-        matrix.append(list(values[i * cols : (i + 1) * cols]))
-    return matrix
-
-
 def load_mouth_landmarks(path: Path) -> list[dict]:
     payload = json.loads(path.read_text(encoding="utf-8"))
     if not isinstance(payload, list):
@@ -46,6 +23,99 @@ def load_mouth_landmarks(path: Path) -> list[dict]:
     return payload
 
 
+_DEFAULT_MOUTH_POINTS = ((0.4, 0.6), (0.46, 0.62), (0.54, 0.62), (0.6, 0.6))
+
+
+class LandmarkTrack:
+    """Struct-of-arrays landmark track: flat double x/y arrays indexed by frame * points + point."""
+
+    def __init__(self, xs: array, ys: array, point_count: int, valid: bytearray | None = None) -> None:
+        self.xs = xs
+        self.ys = ys
+        self.point_count = point_count
+        self.frame_count = len(xs) // point_count if point_count else 0
+        self.valid = valid
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def is_valid(self, frame: int) -> bool:
+        return self.point_count >= 4 and (self.valid is None or bool(self.valid[frame]))
+
+    def base(self, frame: int) -> int:
+        return frame * self.point_count
+
+    @classmethod
+    def from_points(cls, frames: list[list[list[float]]]) -> LandmarkTrack:
+        xs = array("d")
+        ys = array("d")
+        valid = bytearray()
+        for points in frames:
+            ok = len(points) >= 4
+            for x, y in (points[:4] if ok else _DEFAULT_MOUTH_POINTS):
+                xs.append(float(x))
+                ys.append(float(y))
+            valid.append(1 if ok else 0)
+        return cls(xs, ys, 4, valid)
+
+    @classmethod
+    def from_json(cls, path: Path) -> LandmarkTrack:
+        return cls.from_points([row.get("points", []) for row in load_mouth_landmarks(path)])
+
+    @classmethod
+    def from_npy(cls, path: Path) -> LandmarkTrack:
+        descr, shape, data_offset = read_npy_header(path)
+        if descr != "<f8" or len(shape) != 3 or shape[2] != 2:
+            raise ValueError(f"Invalid landmark track: descr={descr} shape={shape}")
+        frames, points = shape[0], shape[1]
+        values = array("d")
+        with path.open("rb") as handle:
+            handle.seek(data_offset)
+            values.frombytes(handle.read(frames * points * 2 * 8))
+        if sys.byteorder != "little":
+            values.byteswap()
+        if points < 4:
+            return cls.from_points([[] for _ in range(frames)])
+        return cls(values[0::2], values[1::2], points)
+
+
+def load_mouth_landmark_track(mouth_landmarks: Path) -> LandmarkTrack:
+    track_path = landmark_track_path(mouth_landmarks)
+    # Prefer the binary sidecar unless the JSON was rewritten after it. Float32 sidecars from
+    # older workspaces round coordinates off the JSON values, so those fall back to the JSON.
+    if track_path.is_file() and (
+        not mouth_landmarks.is_file()
+        or (
+            track_path.stat().st_mtime_ns >= mouth_landmarks.stat().st_mtime_ns
+            and read_npy_header(track_path)[0] == "<f8"
+        )
+    ):
+        return LandmarkTrack.from_npy(track_path)
+    return LandmarkTrack.from_json(mouth_landmarks)
+
+
+def load_silent_runs(voice_activity: Path | None, row_count: int) -> array | None:
+    if voice_activity is None or row_count == 0 or not voice_activity.is_file():
+        return None
+    payload = json.loads(voice_activity.read_text(encoding="utf-8"))
+    if not isinstance(payload, dict) or payload.get("rows") != row_count:
+        # Segment map was built for a different feature file.
+        return None
+    runs = array("i", [-1]) * row_count
+    for run_id, (start, end) in enumerate(payload.get("silent_segments", [])):
+        for row in range(max(0, int(start)), min(row_count, int(end))):
+            runs[row] = run_id
+    return runs
+
+
+def _link_frame(source: Path, target: Path) -> None:
+    target.unlink(missing_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
 def _chunk(kind: bytes, payload: bytes) -> bytes:
     return (
         struct.pack(">I", len(payload))
@@ -130,25 +200,19 @@ def _render_frame(
     return bytes(pixels)
 
 
-def _estimate_mock_3d_params(landmarks: list[dict]) -> dict[str, float]:
-    if not landmarks:
-        return {"yaw": 0.0, "pitch": 0.0, "depth": 0.0}
-
+def _estimate_mock_3d_params(track: LandmarkTrack) -> dict[str, float]:
+    xs, ys = track.xs, track.ys
     yaw_values: list[float] = []
     pitch_values: list[float] = []
     depth_values: list[float] = []
-    for row in landmarks:
-        points = row.get("points", [])
-        if len(points) < 4:
+    for frame in range(len(track)):
+        if not track.is_valid(frame):
             continue
-        left = points[0]
-        upper = points[1]
-        lower = points[2]
-        right = points[3]
-        lx, ly = float(left[0]), float(left[1])
-        rx, ry = float(right[0]), float(right[1])
-        uy = float(upper[1])
-        vy = float(lower[1])
+        base = track.base(frame)
+        lx, ly = xs[base], ys[base]
+        rx = xs[base + 3]
+        uy = ys[base + 1]
+        vy = ys[base + 2]
 
         center_x = (lx + rx) * 0.5
         center_y = (uy + vy) * 0.5
@@ -171,16 +235,17 @@ def _estimate_mock_3d_params(landmarks: list[dict]) -> dict[str, float]:
     }
 
 
-def _temporal_spatial_loss(points: list[list[float]], mouth_open: float, prev_open: float | None) -> float:
-    left = points[0]
-    upper = points[1]
-    lower = points[2]
-    right = points[3]
-
-    lx, ly = float(left[0]), float(left[1])
-    ux, uy = float(upper[0]), float(upper[1])
-    vx, vy = float(lower[0]), float(lower[1])
-    rx, ry = float(right[0]), float(right[1])
+def _temporal_spatial_loss(
+    xs: array,
+    ys: array,
+    base: int,
+    mouth_open: float,
+    prev_open: float | None,
+) -> float:
+    lx, ly = xs[base], ys[base]
+    ux, uy = xs[base + 1], ys[base + 1]
+    vx, vy = xs[base + 2], ys[base + 2]
+    rx, ry = xs[base + 3], ys[base + 3]
 
     center_x = (ux + vx) * 0.5
     left_span = abs(center_x - lx)
@@ -222,6 +287,7 @@ def generate_frames_with_backend(
     frame_count: int = 12,
     backend: str = "heuristic",
     vit_reference_images: list[Path] | None = None,
+    vit_decode_workers: int = 1,
     vit_patch_size: int = 16,
     vit_image_size: int = 224,
     vit_fallback_mock: bool = True,
@@ -236,18 +302,17 @@ def generate_frames_with_backend(
     vit_overfit_guard_strength: float = 0.0,
     temporal_spatial_loss_weight: float = 0.0,
     temporal_smooth_factor: float = 0.35,
+    voice_activity: Path | None = None,
+    reuse_silent_frames: bool = False,
 ) -> dict[str, object]:
     width, height = get_image_size(reference_image)
     width = max(64, min(width, 256))
     height = max(64, min(height, 256))
 
-    features = read_npy_f32_matrix(audio_features)
-    landmarks = load_mouth_landmarks(mouth_landmarks)
-
-    if not features:
-        features = [[0.0, 0.0, 0.0]]
-    if not landmarks:
-        landmarks = [{"frame_index": 0, "points": [[0.4, 0.6], [0.46, 0.62], [0.54, 0.62], [0.6, 0.6]]}]
+    landmarks = load_mouth_landmark_track(mouth_landmarks)
+    if len(landmarks) == 0:
+        landmarks = LandmarkTrack.from_points([[list(point) for point in _DEFAULT_MOUTH_POINTS]])
+    default_track = LandmarkTrack.from_points([[]])
 
     spatial_params = _estimate_mock_3d_params(landmarks) if vit_enable_3d_conditioning else None
 
@@ -263,6 +328,7 @@ def generate_frames_with_backend(
         use_pretrained=vit_use_pretrained,
         device=vit_device,
         reference_images=vit_reference_images,
+        decode_workers=vit_decode_workers,
         spatial_params=spatial_params,
         spatial_weight=vit_3d_conditioning_weight,
         enable_reference_augmentation=vit_enable_reference_augmentation,
@@ -277,50 +343,79 @@ def generate_frames_with_backend(
     loss_values: list[float] = []
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    for i in range(frame_count):
-        feat = features[i % len(features)]
-        rms = float(feat[0]) if len(feat) > 0 else 0.0
-        energy = _clamp(rms * 3.5, 0.0, 1.0)
-
-        lm = landmarks[i % len(landmarks)]
-        points = lm.get("points", [])
-        if len(points) < 4:
-            points = [[0.4, 0.6], [0.46, 0.62], [0.54, 0.62], [0.6, 0.6]]
-
-        mouth_cx = float(points[1][0] + points[2][0]) * 0.5
-        mouth_cy = float(points[1][1] + points[2][1]) * 0.5
-        raw_mouth_open = (
-            abs(float(points[1][1]) - float(points[0][1]))
-            + energy * 0.15 * vit_result.conditioning.mouth_gain
-        )
-        loss_value = _temporal_spatial_loss(points, raw_mouth_open, prev_mouth_open)
-        loss_values.append(loss_value)
-        target_open = raw_mouth_open * (1.0 - (temporal_weight * 0.5 * loss_value))
-        if prev_mouth_open is None:
-            mouth_open = target_open
-        else:
-            mouth_open = (target_open * (1.0 - smooth_factor * temporal_weight)) + (
-                prev_mouth_open * smooth_factor * temporal_weight
+    # Rows stay memory-mapped; each frame reads only the feature row it needs.
+    feature_rows = open_npy_f32_rows(audio_features)
+    features = feature_rows if len(feature_rows) > 0 else [[0.0, 0.0, 0.0]]
+    silent_runs = load_silent_runs(voice_activity, len(feature_rows)) if reuse_silent_frames else None
+    canonical_frames: dict[int, Path] = {}
+    frames_reused = 0
+    frames_rendered = 0
+    render_seconds = 0.0
+    try:
+        for i in range(frame_count):
+            row = i % len(features)
+            feat = features[row]
+            rms = float(feat[0]) if len(feat) > 0 else 0.0
+            energy = _clamp(rms * 3.5, 0.0, 1.0)
+
+            frame_index = i % len(landmarks)
+            track = landmarks if landmarks.is_valid(frame_index) else default_track
+            base = track.base(frame_index) if track is landmarks else 0
+            xs, ys = track.xs, track.ys
+
+            mouth_cx = (xs[base + 1] + xs[base + 2]) * 0.5
+            mouth_cy = (ys[base + 1] + ys[base + 2]) * 0.5
+            raw_mouth_open = abs(ys[base + 1] - ys[base]) + energy * 0.15 * vit_result.conditioning.mouth_gain
+            loss_value = _temporal_spatial_loss(xs, ys, base, raw_mouth_open, prev_mouth_open)
+            loss_values.append(loss_value)
+            target_open = raw_mouth_open * (1.0 - (temporal_weight * 0.5 * loss_value))
+            if prev_mouth_open is None:
+                mouth_open = target_open
+            else:
+                mouth_open = (target_open * (1.0 - smooth_factor * temporal_weight)) + (
+                    prev_mouth_open * smooth_factor * temporal_weight
+                )
+            mouth_open = _clamp(mouth_open, 0.0, 1.2)
+
+            frame_path = output_dir / f"{i:06d}.png"
+            run_id = silent_runs[row] if silent_runs is not None else -1
+            if run_id >= 0:
+                # Every frame of a silent run shows the same closed mouth, rendered once.
+                mouth_open = 0.0
+                energy = 0.0
+                canonical = canonical_frames.get(run_id)
+                if canonical is not None:
+                    prev_mouth_open = mouth_open
+                    _link_frame(canonical, frame_path)
+                    frames_reused += 1
+                    continue
+                canonical_frames[run_id] = frame_path
+            prev_mouth_open = mouth_open
+
+            started = time.perf_counter()
+            frame = _render_frame(
+                width,
+                height,
+                mouth_cx,
+                mouth_cy,
+                mouth_open,
+                energy,
+                vit=vit_result.conditioning,
             )
-        mouth_open = _clamp(mouth_open, 0.0, 1.2)
-        prev_mouth_open = mouth_open
-
-        frame = _render_frame(
-            width,
-            height,
-            mouth_cx,
-            mouth_cy,
-            mouth_open,
-            energy,
-            vit=vit_result.conditioning,
-        )
-        write_png_rgb(output_dir / f"{i:06d}.png", width, height, frame)
+            # A previous run may have left this path hard-linked to a canonical silent frame.
+            frame_path.unlink(missing_ok=True)
+            write_png_rgb(frame_path, width, height, frame)
+            render_seconds += time.perf_counter() - started
+            frames_rendered += 1
+    finally:
+        feature_rows.close()
 
     return {
         "frame_count": frame_count,
         "backend_requested": backend,
         "backend_used": vit_result.backend_used,
         "vit_details": vit_result.details,
+        "vit_reference_decode": vit_result.reference_decode,
         "vit_model_name": vit_model_name,
         "vit_use_pretrained": vit_use_pretrained,
         "vit_device": vit_device,
@@ -335,4 +430,9 @@ def generate_frames_with_backend(
         "temporal_spatial_loss_mean": (
             sum(loss_values) / max(1.0, float(len(loss_values)))
         ),
+        "reuse_silent_frames": silent_runs is not None,
+        "frames_rendered": frames_rendered,
+        "frames_reused": frames_reused,
+        "render_time_sec": render_seconds,
+        "render_time_saved_sec": (render_seconds / max(1, frames_rendered)) * frames_reused,
     }
@@ -1,11 +1,63 @@
 from __future__ import annotations
 
+import argparse
+import mmap
+import os
 import struct
 import subprocess
+import sys
+import threading
+import time
 import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pipeline.feature_cache import evict_oldest_entries, hash_file, replace_cache_entry
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency path
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency path
+    Image = None
 
 PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+FFMPEG_BATCH_MAX_IMAGES = 32
+DEFAULT_IMAGE_CACHE_MAX_BYTES = 64 << 20
+DEFAULT_RGB_SIDECAR_MAX_BYTES = 1 << 30
+REFERENCE_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+RGB_SIDECAR_VERSION = 1
+# magic, version, width, height; the rgb24 payload follows the 16-byte header.
+_RGB_SIDECAR_HEADER = struct.Struct("<6sHII")
+_RGB_SIDECAR_MAGIC = b"MAVRGB"
+_DECODER_DISABLE_AFTER = 3
+_PILLOW_FORMATS = frozenset({"png", "jpeg", "bmp", "webp", "gif"})
+_WAVEFRONT_BLOCK_ROWS = 512
+_DECODE_BLOCK_ROWS = 512
+_INFLATE_PIECE_BYTES = 1 << 16
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+_PNG_BIT_DEPTHS = {0: (1, 2, 4, 8, 16), 2: (8, 16), 3: (1, 2, 4, 8), 4: (8, 16), 6: (8, 16)}
+# (x0, y0, dx, dy) of the seven Adam7 passes.
+_ADAM7_PASSES = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+# Sub-byte samples are packed most significant bits first.
+_SUB_BYTE_TABLES = {
+    depth: [
+        bytes((value >> shift) & ((1 << depth) - 1) for shift in range(8 - depth, -1, -depth)) for value in range(256)
+    ]
+    for depth in (1, 2, 4)
+}
+_GRAY_SCALE_TABLES = {
+    depth: bytes(min(255, value * (255 // ((1 << depth) - 1))) for value in range(256)) for depth in (1, 2, 4)
+}
 
 
 def _ffmpeg_decode_rgb(path: Path, width: int, height: int) -> bytes | None:
@@ -35,6 +87,37 @@ def _ffmpeg_decode_rgb(path: Path, width: int, height: int) -> bytes | None:
     return result.stdout[:expected]
 
 
+def _ffmpeg_batch_command(paths: list[Path], width: int, height: int) -> list[str]:
+    command = ["ffmpeg", "-nostdin", "-v", "error"]
+    for path in paths:
+        command.extend(["-i", str(path)])
+    # Every input is cut to its first frame and scaled before concat, so the rawvideo
+    # stream holds exactly one width x height frame per input, in input order.
+    chains = [
+        f"[{index}:v]trim=end_frame=1,scale={width}:{height},setsar=1,format=rgb24[v{index}]"
+        for index in range(len(paths))
+    ]
+    inputs = "".join(f"[v{index}]" for index in range(len(paths)))
+    chains.append(f"{inputs}concat=n={len(paths)}:v=1:a=0[out]")
+    # The stills all start at pts 0; passthrough keeps the muxer from dropping them as duplicates.
+    command.extend(["-filter_complex", ";".join(chains), "-map", "[out]", "-vsync", "passthrough"])
+    command.extend(["-f", "rawvideo", "-pix_fmt", "rgb24", "-"])
+    return command
+
+
+def _ffmpeg_decode_rgb_batch(paths: list[Path], width: int, height: int) -> list[bytes] | None:
+    try:
+        result = subprocess.run(_ffmpeg_batch_command(paths, width, height), capture_output=True, check=False)
+    except (FileNotFoundError, OSError):
+        return None
+    if result.returncode != 0:
+        return None
+    frame_bytes = width * height * 3
+    if len(result.stdout) != frame_bytes * len(paths):
+        return None
+    return [result.stdout[index * frame_bytes : (index + 1) * frame_bytes] for index in range(len(paths))]
+
+
 def _paeth(a: int, b: int, c: int) -> int:
     p = a + b - c
     pa = abs(p - a)
@@ -47,11 +130,10 @@ def _paeth(a: int, b: int, c: int) -> int:
     return c
 
 
-def _unfilter_scanlines(raw: bytes, width: int, channels: int) -> bytes:
-    stride = width * channels
+def _unfilter_scanlines_python(raw: bytes, stride: int, channels: int, prev_row: bytes | None = None) -> bytes:
     rows = []
     offset = 0
-    prev = bytearray(stride)
+    prev = bytearray(prev_row if prev_row is not None else stride)
     while offset < len(raw):
         filter_type = raw[offset]
         offset += 1
@@ -83,15 +165,232 @@ def _unfilter_scanlines(raw: bytes, width: int, channels: int) -> bytes:
     return b"".join(rows)
 
 
-def _decode_png_rgb(path: Path, width: int, height: int) -> bytes | None:
-    raw = path.read_bytes()
+def _unfilter_wavefront(prev, filtered, filter_types) -> None:
+    """Reverse a block of scanlines in place, one anti-diagonal of pixels at a time.
+
+    Pixel (k, x) only needs (k, x-1), (k-1, x) and (k-1, x-1), which all lie on earlier
+    diagonals. Rows are skewed so that diagonal ``c`` is the contiguous slice
+    ``skewed[c]``: pixel (k, x) of block row k (row 0 is ``prev``) sits at column x + 1 + k.
+    """
+    rows, pixels, bpp = filtered.shape
+    columns = rows + pixels + 1
+    skewed = np.zeros((columns, rows + 1, bpp), dtype=np.int16)
+    source = np.zeros((columns, rows + 1, bpp), dtype=np.uint8)
+    skewed[1 : pixels + 1, 0] = prev
+    for k in range(rows):
+        source[k + 2 : k + 2 + pixels, k + 1] = filtered[k]
+    kinds = filter_types.reshape(rows, 1)
+    uniform = int(kinds[0, 0]) if np.all(kinds == kinds[0, 0]) else None
+    is_none, is_sub, is_up, is_avg = (kinds == kind for kind in range(4))
+    for c in range(2, columns):
+        lo = max(1, c - pixels)
+        hi = min(rows, c - 1) + 1
+        left = skewed[c - 1, lo:hi]
+        up = skewed[c - 1, lo - 1 : hi - 1]
+        up_left = skewed[c - 2, lo - 1 : hi - 1]
+        if uniform == 3:
+            predictor = (left + up) >> 1
+        else:
+            from_up = up - up_left
+            from_left = left - up_left
+            pa = np.abs(from_up)
+            pb = np.abs(from_left)
+            pc = np.abs(from_up + from_left)
+            predictor = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, up_left))
+            if uniform != 4:
+                rows_used = slice(lo - 1, hi - 1)
+                predictor = np.where(is_avg[rows_used], (left + up) >> 1, predictor)
+                predictor = np.where(is_up[rows_used], up, predictor)
+                predictor = np.where(is_sub[rows_used], left, predictor)
+                predictor = np.where(is_none[rows_used], 0, predictor)
+        target = skewed[c, lo:hi]
+        np.add(source[c, lo:hi], predictor, out=target)
+        target &= 0xFF
+    for k in range(rows):
+        filtered[k] = skewed[k + 2 : k + 2 + pixels, k + 1]
+
+
+def _unfilter_scanlines_numpy(raw: bytes, stride: int, channels: int, prev_row: bytes | None = None) -> bytes | None:
+    if stride == 0 or stride % channels or len(raw) % (stride + 1) != 0:
+        return None
+    width = stride // channels
+    rows = len(raw) // (stride + 1)
+    scan = np.frombuffer(raw, dtype=np.uint8).reshape(rows, stride + 1)
+    filter_types = scan[:, 0].astype(np.int16)
+    if np.any(filter_types > 4):
+        return None
+    out = scan[:, 1:].reshape(rows, width, channels).copy()
+    # Average/Paeth rows depend on their left neighbour and go through the wavefront in
+    # blocks; None/Sub/Up rows are vectorized per row.
+    if prev_row is not None:
+        prev = np.frombuffer(prev_row, dtype=np.uint8).reshape(width, channels)
+    else:
+        prev = np.zeros((width, channels), dtype=np.uint8)
+    row = 0
+    while row < rows:
+        kind = filter_types[row]
+        if kind >= 3:
+            end = min(rows, row + _WAVEFRONT_BLOCK_ROWS)
+            _unfilter_wavefront(prev, out[row:end], filter_types[row:end])
+            row = end
+        else:
+            if kind == 1:
+                np.cumsum(out[row], axis=0, dtype=np.uint8, out=out[row])
+            elif kind == 2:
+                out[row] += prev
+            row += 1
+        prev = out[row - 1]
+    return out.tobytes()
+
+
+def _unfilter_scanlines(raw: bytes, stride: int, channels: int, prev_row: bytes | None = None) -> bytes:
+    """Reverse PNG row filters; ``channels`` is the filter unit in bytes (bytes per pixel, at least 1).
+
+    ``prev_row`` is the last unfiltered row of the previous block when decoding in blocks.
+    """
+    if np is not None:
+        unpacked = _unfilter_scanlines_numpy(raw, stride, channels, prev_row)
+        if unpacked is not None:
+            return unpacked
+    return _unfilter_scanlines_python(raw, stride, channels, prev_row)
+
+
+class _AreaResizer:
+    """Streaming separable resize of RGB rows, fed a block of source rows at a time.
+
+    Axes that shrink are box (area) averaged with exact integer weights: on a common grid
+    source pixel x spans [x * dst, (x + 1) * dst) and output pixel o spans [o * src, (o + 1) * src),
+    so each source pixel feeds at most two outputs. Axes that grow keep the nearest-neighbour
+    mapping. Only one output row of accumulators is held between blocks.
+    """
+
+    def __init__(self, src_w: int, src_h: int, width: int, height: int) -> None:
+        self.src_w = src_w
+        self.src_h = src_h
+        self.width = width
+        self.height = height
+        self.out = bytearray(width * height * 3)
+        self.area_x = width < src_w
+        self.area_y = height < src_h
+        self.weight = (src_w if self.area_x else 1) * (src_h if self.area_y else 1)
+        self.cols = [min(src_w - 1, (x * src_w) // width) for x in range(width)]
+        self.row_targets: dict[int, list[int]] = {}
+        if not self.area_y:
+            for y in range(height):
+                self.row_targets.setdefault(min(src_h - 1, (y * src_h) // height), []).append(y)
+        self.spans: list[list[tuple[int, int]]] = [[] for _ in range(width)]
+        if self.area_x:
+            for x in range(src_w):
+                lo = x * width
+                hi = lo + width
+                target = lo // src_w
+                boundary = (target + 1) * src_w
+                if hi <= boundary:
+                    self.spans[target].append((x, width))
+                else:
+                    self.spans[target].append((x, boundary - lo))
+                    self.spans[target + 1].append((x, hi - boundary))
+        if np is not None:
+            self.edge_pixels, self.edge_parts = np.divmod(np.arange(width + 1, dtype=np.int64) * src_w, width)
+        self.acc = None
+        self.row = 0
+
+    def _columns(self, row):
+        """Reduce one row of (vertically summed) pixels to ``width`` integer sums."""
+        if np is None:
+            if not self.area_x:
+                return [row[x * 3 + band] for x in self.cols for band in range(3)]
+            return [sum(row[x * 3 + band] * weight for x, weight in span) for span in self.spans for band in range(3)]
+        if not self.area_x:
+            return row[self.cols].astype(np.int64)
+        # Integral along x on the common grid, sampled at the output pixel boundaries.
+        prefix = np.zeros((self.src_w + 1, 3), dtype=np.int64)
+        np.cumsum(row, axis=0, out=prefix[1:])
+        padded = np.zeros((self.src_w + 1, 3), dtype=np.int64)
+        padded[: self.src_w] = row
+        integral = prefix[self.edge_pixels] * self.width + padded[self.edge_pixels] * self.edge_parts[:, None]
+        return integral[1:] - integral[:-1]
+
+    def _emit(self, target: int, row) -> None:
+        values = self._columns(row)
+        half = self.weight // 2
+        start = target * self.width * 3
+        if np is not None:
+            self.out[start : start + self.width * 3] = ((values + half) // self.weight).astype(np.uint8).tobytes()
+        else:
+            self.out[start : start + self.width * 3] = bytes((value + half) // self.weight for value in values)
+
+    def _scaled(self, row, factor: int):
+        if np is not None:
+            return row.astype(np.int64) * factor
+        return [value * factor for value in row]
+
+    def _push_row(self, row) -> None:
+        y = self.row
+        self.row += 1
+        if not self.area_y:
+            for target in self.row_targets.get(y, ()):
+                self._emit(target, row)
+            return
+        # Rows are summed at source width first, so the horizontal pass only runs once
+        # per output row; integer sums make the order irrelevant to the result.
+        lo = y * self.height
+        hi = lo + self.height
+        target = lo // self.src_h
+        boundary = (target + 1) * self.src_h
+        head = self._scaled(row, min(hi, boundary) - lo)
+        if self.acc is None:
+            self.acc = head
+        elif np is not None:
+            self.acc += head
+        else:
+            self.acc = [a + b for a, b in zip(self.acc, head)]
+        if hi >= boundary:
+            self._emit(target, self.acc)
+            self.acc = self._scaled(row, hi - boundary) if hi > boundary else None
+
+    def push(self, rgb: bytes) -> None:
+        stride = self.src_w * 3
+        rows = len(rgb) // stride
+        if self.width == self.src_w and self.height == self.src_h:
+            start = self.row * stride
+            self.out[start : start + len(rgb)] = rgb
+            self.row += rows
+            return
+        if np is not None:
+            block = np.frombuffer(rgb, dtype=np.uint8).reshape(rows, self.src_w, 3)
+            for row in block:
+                self._push_row(row)
+            return
+        for row in range(rows):
+            self._push_row(rgb[row * stride : (row + 1) * stride])
+
+    def result(self) -> bytes:
+        if self.row != self.src_h:
+            raise ValueError(f"resize fed {self.row} of {self.src_h} rows")
+        return bytes(self.out)
+
+
+@dataclass(frozen=True)
+class _PngImage:
+    width: int
+    height: int
+    bit_depth: int
+    color_type: int
+    interlaced: bool
+    palette: bytes
+    idat: tuple[memoryview, ...]
+
+
+def _read_png(raw: bytes) -> _PngImage | None:
     if not raw.startswith(PNG_SIGNATURE):
         return None
 
     idx = len(PNG_SIGNATURE)
-    idat = bytearray()
-    src_w = src_h = 0
-    bit_depth = color_type = None
+    view = memoryview(raw)
+    idat: list[memoryview] = []
+    palette = b""
+    header = None
     while idx + 8 <= len(raw):
         chunk_len = struct.unpack(">I", raw[idx : idx + 4])[0]
         chunk_type = raw[idx + 4 : idx + 8]
@@ -99,52 +398,163 @@ def _decode_png_rgb(path: Path, width: int, height: int) -> bytes | None:
         data_end = data_start + chunk_len
         if data_end + 4 > len(raw):
             return None
-        chunk_data = raw[data_start:data_end]
         idx = data_end + 4
 
-        if chunk_type == b"IHDR":
-            src_w = struct.unpack(">I", chunk_data[0:4])[0]
-            src_h = struct.unpack(">I", chunk_data[4:8])[0]
-            bit_depth = int(chunk_data[8])
-            color_type = int(chunk_data[9])
+        if chunk_type == b"IHDR" and chunk_len >= 13:
+            header = struct.unpack(">IIBBBBB", raw[data_start : data_start + 13])
+        elif chunk_type == b"PLTE":
+            palette = raw[data_start : data_end - chunk_len % 3]
         elif chunk_type == b"IDAT":
-            idat.extend(chunk_data)
+            idat.append(view[data_start:data_end])
         elif chunk_type == b"IEND":
             break
 
-    if not src_w or not src_h or bit_depth != 8 or color_type not in (2, 6):
+    if header is None:
         return None
-
-    channels = 3 if color_type == 2 else 4
-    inflated = zlib.decompress(bytes(idat))
-    unpacked = _unfilter_scanlines(inflated, src_w, channels)
-    if len(unpacked) != src_w * src_h * channels:
+    src_w, src_h, bit_depth, color_type, compression, filter_method, interlace = header
+    if not src_w or not src_h or compression != 0 or filter_method != 0 or interlace not in (0, 1):
+        return None
+    if bit_depth not in _PNG_BIT_DEPTHS.get(color_type, ()):
         return None
+    if color_type == 3 and not palette:
+        return None
+    return _PngImage(src_w, src_h, bit_depth, color_type, interlace == 1, palette, tuple(idat))
+
+
+def _png_samples(unpacked: bytes, count: int, rows: int, stride: int, bit_depth: int) -> bytes:
+    """Widen filtered-out scanlines to one byte per sample (16-bit keeps the high byte)."""
+    if bit_depth == 8:
+        return unpacked
+    if bit_depth == 16:
+        return unpacked[0::2]
+    per_byte = 8 // bit_depth
+    table = _SUB_BYTE_TABLES[bit_depth]
+    if np is not None:
+        lookup = np.frombuffer(b"".join(table), dtype=np.uint8).reshape(256, per_byte)
+        packed = np.frombuffer(unpacked, dtype=np.uint8).reshape(rows, stride)
+        return lookup[packed].reshape(rows, stride * per_byte)[:, :count].tobytes()
+    return b"".join(
+        b"".join(table[value] for value in unpacked[row * stride : (row + 1) * stride])[:count] for row in range(rows)
+    )
+
+
+def _png_stride(image: _PngImage, width: int) -> int:
+    return (width * _PNG_CHANNELS[image.color_type] * image.bit_depth + 7) // 8
 
-    rgb = bytearray(src_w * src_h * 3)
-    if channels == 3:
-        rgb[:] = unpacked
+
+def _png_rows_rgb(image: _PngImage, unpacked: bytes, width: int, rows: int) -> bytes:
+    channels = _PNG_CHANNELS[image.color_type]
+    samples = _png_samples(unpacked, width * channels, rows, _png_stride(image, width), image.bit_depth)
+
+    # Alpha (RGBA, gray+alpha, tRNS) is dropped, as in ffmpeg's rgb24 conversion.
+    rgb = bytearray(width * rows * 3)
+    if image.color_type == 2:
+        rgb[:] = samples
+    elif image.color_type == 6:
+        for band in range(3):
+            rgb[band::3] = samples[band::4]
+    elif image.color_type == 3:
+        entries = image.palette + bytes(768 - len(image.palette))
+        for band in range(3):
+            rgb[band::3] = samples.translate(entries[band::3])
     else:
-        for i in range(src_w * src_h):
-            rgb[i * 3 : i * 3 + 3] = unpacked[i * 4 : i * 4 + 3]
-
-    if src_w == width and src_h == height:
-        return bytes(rgb)
-
-    # nearest-neighbor resize
-    out = bytearray(width * height * 3)
-    for y in range(height):
-        sy = int((y * src_h) / max(1, height))
-        if sy >= src_h:
-            sy = src_h - 1
-        for x in range(width):
-            sx = int((x * src_w) / max(1, width))
-            if sx >= src_w:
-                sx = src_w - 1
-            src_idx = (sy * src_w + sx) * 3
-            dst_idx = (y * width + x) * 3
-            out[dst_idx : dst_idx + 3] = rgb[src_idx : src_idx + 3]
-    return bytes(out)
+        gray = samples if image.color_type == 0 else samples[0::2]
+        if image.bit_depth < 8:
+            gray = gray.translate(_GRAY_SCALE_TABLES[image.bit_depth])
+        for band in range(3):
+            rgb[band::3] = gray
+    return bytes(rgb)
+
+
+def _png_filter_unit(image: _PngImage) -> int:
+    return max(1, _PNG_CHANNELS[image.color_type] * image.bit_depth // 8)
+
+
+def _iter_png_rgb_blocks(image: _PngImage) -> Iterator[bytes]:
+    """Inflate, unfilter and convert a progressive PNG ``_DECODE_BLOCK_ROWS`` rows at a time."""
+    stride = _png_stride(image, image.width)
+    row_bytes = stride + 1
+    inflater = zlib.decompressobj()
+    # IDAT is fed in bounded pieces: zlib copies the unconsumed input into unconsumed_tail.
+    chunks = (
+        chunk[start : start + _INFLATE_PIECE_BYTES]
+        for chunk in image.idat
+        for start in range(0, len(chunk), _INFLATE_PIECE_BYTES)
+    )
+    source: bytes | memoryview = b""
+    pending = bytearray()
+    prev_row = None
+    rows_done = 0
+    while rows_done < image.height:
+        wanted = min(_DECODE_BLOCK_ROWS, image.height - rows_done) * row_bytes
+        while len(pending) < wanted and not inflater.eof:
+            if not source:
+                source = next(chunks, None)
+                if source is None:
+                    pending += inflater.flush()
+                    break
+            pending += inflater.decompress(source, wanted - len(pending))
+            source = inflater.unconsumed_tail
+        rows = min(len(pending) // row_bytes, image.height - rows_done)
+        if rows == 0:
+            raise ValueError("PNG image data ends early")
+        block = _unfilter_scanlines(bytes(pending[: rows * row_bytes]), stride, _png_filter_unit(image), prev_row)
+        del pending[: rows * row_bytes]
+        prev_row = block[-stride:]
+        rows_done += rows
+        yield _png_rows_rgb(image, block, image.width, rows)
+    if pending or (not inflater.eof and inflater.decompress(b"".join([source, *chunks]), 1)):
+        raise ValueError("PNG image data has trailing bytes")
+
+
+def _png_adam7_rgb(image: _PngImage) -> bytes:
+    data = zlib.decompress(b"".join(image.idat))
+    full = bytearray(image.width * image.height * 3)
+    if np is not None:
+        canvas = np.frombuffer(full, dtype=np.uint8).reshape(image.height, image.width, 3)
+    offset = 0
+    for x0, y0, dx, dy in _ADAM7_PASSES:
+        pass_w = max(0, (image.width - x0 + dx - 1) // dx)
+        pass_h = max(0, (image.height - y0 + dy - 1) // dy)
+        if not pass_w or not pass_h:
+            continue
+        stride = _png_stride(image, pass_w)
+        size = pass_h * (stride + 1)
+        if offset + size > len(data):
+            raise ValueError("PNG image data ends early")
+        unpacked = _unfilter_scanlines(data[offset : offset + size], stride, _png_filter_unit(image))
+        pixels = _png_rows_rgb(image, unpacked, pass_w, pass_h)
+        offset += size
+        if np is not None:
+            canvas[y0::dy, x0::dx] = np.frombuffer(pixels, dtype=np.uint8).reshape(pass_h, pass_w, 3)
+            continue
+        for row in range(pass_h):
+            line = pixels[row * pass_w * 3 : (row + 1) * pass_w * 3]
+            base = ((y0 + row * dy) * image.width + x0) * 3
+            for band in range(3):
+                start = base + band
+                full[start : start + (pass_w - 1) * dx * 3 + 1 : dx * 3] = line[band::3]
+    if offset != len(data):
+        raise ValueError("PNG image data has trailing bytes")
+    return bytes(full)
+
+
+def _decode_png_rgb(path: Path, width: int, height: int) -> bytes | None:
+    image = _read_png(path.read_bytes())
+    if image is None:
+        return None
+    # Progressive images are resized while they are decoded, so only a block of source
+    # rows is held at a time; Adam7 passes cover the whole image and are decoded first.
+    resizer = _AreaResizer(image.width, image.height, width, height)
+    try:
+        if image.interlaced:
+            resizer.push(_png_adam7_rgb(image))
+        else:
+            for block in _iter_png_rgb_blocks(image):
+                resizer.push(block)
+        return resizer.result()
+    except (ValueError, zlib.error):
+        return None
 
 
 def _fallback_bytes(path: Path, width: int, height: int) -> bytes:
@@ -158,11 +568,498 @@ def _fallback_bytes(path: Path, width: int, height: int) -> bytes:
     return bytes(out)
 
 
-def load_rgb_image(path: Path, width: int, height: int) -> bytes:
-    decoded = _ffmpeg_decode_rgb(path, width, height)
-    if decoded is not None:
-        return decoded
-    decoded = _decode_png_rgb(path, width, height)
+def sniff_image_format(path: Path) -> str:
+    try:
+        with path.open("rb") as handle:
+            head = handle.read(12)
+    except OSError:
+        return "unknown"
+    if head.startswith(PNG_SIGNATURE):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    return "unknown"
+
+
+def _probe_ffmpeg() -> bool:
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, check=False)
+    except (FileNotFoundError, OSError):
+        return False
+    return result.returncode == 0
+
+
+def _pillow_decode_rgb(path: Path, width: int, height: int) -> bytes | None:
+    try:
+        with Image.open(path) as image:
+            # Lets JPEG decode at a reduced DCT scale when the target is much smaller.
+            image.draft("RGB", (width, height))
+            if image.mode in ("I", "F") or image.mode.startswith("I;16"):
+                # convert("RGB") clips wide grayscale; keep the high byte like the PNG decoder does.
+                image = image.convert("I").point(lambda value: value * (1 / 256)).convert("L")
+            rgb = image.convert("RGB")
+            if rgb.size != (width, height):
+                rgb = rgb.resize((width, height), Image.BOX)
+            return rgb.tobytes()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+@dataclass(frozen=True)
+class DecoderBackend:
+    name: str
+    decode: Callable[[Path, int, int], bytes | None]
+    probe: Callable[[], bool]
+    # Sniffed formats the backend handles; None accepts anything, including "unknown".
+    formats: frozenset[str] | None = None
+
+
+class DecoderRegistry:
+    """Image decoder backends in preference order, each probed once per process.
+
+    A file goes to the first available backend that handles its sniffed format. The order is
+    fixed rather than latency-driven so a node always produces the same pixels for a file;
+    the latency counters are there to inform that order. A backend that fails
+    ``disable_after`` times in a row on a format, each time on a file that a later backend
+    did decode, is skipped for that format afterwards. Files that no backend can decode
+    (corrupt inputs) are not held against any backend.
+    """
+
+    def __init__(self, backends: Sequence[DecoderBackend], disable_after: int = _DECODER_DISABLE_AFTER) -> None:
+        self.backends = list(backends)
+        self.disable_after = disable_after
+        self._available: dict[str, bool] = {}
+        self._streaks: dict[tuple[str, str], int] = {}
+        self._disabled: set[tuple[str, str]] = set()
+        self._counters = {backend.name: {"calls": 0, "failures": 0, "decode_sec": 0.0} for backend in self.backends}
+        self._lock = threading.Lock()
+
+    def available(self, backend: DecoderBackend) -> bool:
+        # Probing under the lock keeps concurrent decode threads from probing twice.
+        with self._lock:
+            if backend.name not in self._available:
+                self._available[backend.name] = bool(backend.probe())
+            return self._available[backend.name]
+
+    def candidates(self, fmt: str) -> list[DecoderBackend]:
+        return [
+            backend
+            for backend in self.backends
+            if (backend.formats is None or fmt in backend.formats)
+            and (backend.name, fmt) not in self._disabled
+            and self.available(backend)
+        ]
+
+    def preferred(self, fmt: str) -> str | None:
+        candidates = self.candidates(fmt)
+        return candidates[0].name if candidates else None
+
+    def record(self, name: str, fmt: str, ok: bool, elapsed: float) -> None:
+        with self._lock:
+            counters = self._counters[name]
+            counters["calls"] += 1
+            counters["decode_sec"] += elapsed
+            if ok:
+                self._streaks[(name, fmt)] = 0
+            else:
+                counters["failures"] += 1
+
+    def _blame(self, names: list[str], fmt: str) -> None:
+        with self._lock:
+            for name in names:
+                streak = self._streaks.get((name, fmt), 0) + 1
+                self._streaks[(name, fmt)] = streak
+                if streak >= self.disable_after:
+                    self._disabled.add((name, fmt))
+
+    def decode(self, path: Path, width: int, height: int, fmt: str | None = None) -> tuple[bytes, str]:
+        fmt = fmt or sniff_image_format(path)
+        failed: list[str] = []
+        for backend in self.candidates(fmt):
+            started = time.perf_counter()
+            rgb = backend.decode(path, width, height)
+            self.record(backend.name, fmt, rgb is not None, time.perf_counter() - started)
+            if rgb is not None:
+                self._blame(failed, fmt)
+                return rgb, backend.name
+            failed.append(backend.name)
+        return _fallback_bytes(path, width, height), "fallback"
+
+    def stats(self) -> dict[str, dict[str, object]]:
+        with self._lock:
+            return {
+                backend.name: {
+                    "available": self._available.get(backend.name),
+                    "calls": self._counters[backend.name]["calls"],
+                    "failures": self._counters[backend.name]["failures"],
+                    "decode_sec": round(self._counters[backend.name]["decode_sec"], 6),
+                    "disabled_formats": sorted(fmt for name, fmt in self._disabled if name == backend.name),
+                }
+                for backend in self.backends
+            }
+
+
+def build_decoder_registry() -> DecoderRegistry:
+    """Pillow (optional) first, then ffmpeg, then the in-process PNG decoder (NumPy-accelerated when present)."""
+    return DecoderRegistry(
+        [
+            DecoderBackend("pillow", _pillow_decode_rgb, lambda: Image is not None, _PILLOW_FORMATS),
+            DecoderBackend("ffmpeg", _ffmpeg_decode_rgb, _probe_ffmpeg),
+            DecoderBackend("png", _decode_png_rgb, lambda: True, frozenset({"png"})),
+        ]
+    )
+
+
+DECODERS = build_decoder_registry()
+
+
+class DecodedImageCache:
+    """Thread-safe LRU of decoded RGB images bounded by their total size in bytes.
+
+    Entries are keyed by (path, mtime_ns, size, width, height), so a rewritten file misses.
+    Two threads that miss on the same key both decode it; the later result replaces the first.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_IMAGE_CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            rgb = self._entries.get(key)
+            if rgb is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rgb
+
+    def put(self, key: tuple, rgb: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            if len(rgb) > self.max_bytes:
+                return
+            self._entries[key] = rgb
+            self.current_bytes += len(rgb)
+            self._evict()
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "bytes": self.current_bytes,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self) -> None:
+        while self.current_bytes > self.max_bytes:
+            _, rgb = self._entries.popitem(last=False)
+            self.current_bytes -= len(rgb)
+            self.evictions += 1
+
+
+IMAGE_CACHE = DecodedImageCache()
+
+
+class RgbSidecarCache:
+    """Decoded, resized rgb24 images on disk, keyed by content hash, target size and decoder backend.
+
+    Backends do not agree to the last pixel (resampling filters differ), so the backend is part
+    of the key and a directory shared between nodes with different decoders never mixes them.
+
+    Entries are raw files with a small header that ``fetch`` memory-maps read-only, so a
+    hit costs no decode and concurrent worker processes share the same page cache.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_RGB_SIDECAR_MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def entry_path(self, digest: str, width: int, height: int, backend: str) -> Path:
+        return self.root / digest[:2] / f"{digest}-{width}x{height}-{backend}.rgb"
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def fetch(self, digest: str, width: int, height: int, backend: str) -> memoryview | None:
+        entry = self.entry_path(digest, width, height, backend)
+        try:
+            with entry.open("rb") as handle:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing, or empty (mmap rejects zero-length files).
+            self._count("misses")
+            return None
+        header = _RGB_SIDECAR_HEADER.size
+        expected = (_RGB_SIDECAR_MAGIC, RGB_SIDECAR_VERSION, width, height)
+        if len(mapped) != header + width * height * 3 or _RGB_SIDECAR_HEADER.unpack(mapped[:header]) != expected:
+            mapped.close()
+            self._count("misses")
+            return None
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        self._count("hits")
+        # The view keeps the mapping alive; it is unmapped once the last reference goes away.
+        return memoryview(mapped)[header:]
+
+    def store(self, digest: str, width: int, height: int, backend: str, rgb: bytes) -> int:
+        with replace_cache_entry(self.entry_path(digest, width, height, backend)) as tmp_path:
+            with tmp_path.open("wb") as handle:
+                handle.write(_RGB_SIDECAR_HEADER.pack(_RGB_SIDECAR_MAGIC, RGB_SIDECAR_VERSION, width, height))
+                handle.write(rgb)
+        self._count("stores")
+        return self.evict()
+
+    def evict(self) -> int:
+        # Mapped readers keep their pages; unlinking only drops the directory entry.
+        evicted = evict_oldest_entries(self.root, "*/*.rgb", self.max_bytes)
+        self._count("evictions", evicted)
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions}
+
+
+RGB_SIDECAR_CACHE: RgbSidecarCache | None = None
+
+
+def configure_rgb_sidecar_cache(
+    root: Path | None, max_bytes: int = DEFAULT_RGB_SIDECAR_MAX_BYTES
+) -> RgbSidecarCache | None:
+    """Point ``load_rgb_image(s)`` at an on-disk sidecar directory, or disable it with ``None``."""
+    global RGB_SIDECAR_CACHE
+    if root is None:
+        RGB_SIDECAR_CACHE = None
+    elif RGB_SIDECAR_CACHE is None or RGB_SIDECAR_CACHE.root != root:
+        RGB_SIDECAR_CACHE = RgbSidecarCache(root, max_bytes)
+    else:
+        RGB_SIDECAR_CACHE.max_bytes = max_bytes
+    return RGB_SIDECAR_CACHE
+
+
+def _image_cache_key(path: Path, width: int, height: int) -> tuple | None:
+    try:
+        stat = path.stat()
+        resolved = path.resolve()
+    except OSError:
+        return None
+    return (str(resolved), stat.st_mtime_ns, stat.st_size, width, height)
+
+
+def _load_rgb_shard(
+    paths: list[Path], keys: list[tuple | None], width: int, height: int, sidecar: RgbSidecarCache | None
+) -> list[tuple[bytes | memoryview, str, float]]:
+    """Load images that missed ``IMAGE_CACHE``: sidecar first, then one ffmpeg batch for the images
+    routed to ffmpeg, then per image through ``DECODERS``."""
+    results: list[tuple[bytes | memoryview, str, float] | None] = [None] * len(paths)
+    decoders = DECODERS
+    formats = [sniff_image_format(path) for path in paths]
+    digests: dict[int, str] = {}
+    pending: list[int] = []
+    for index, path in enumerate(paths):
+        started = time.perf_counter()
+        # Look up the entry of the backend that would decode this file on this node.
+        backend = decoders.preferred(formats[index]) if sidecar is not None else None
+        if backend is not None:
+            try:
+                digests[index] = hash_file(path)
+            except OSError:
+                pass
+            else:
+                mapped = sidecar.fetch(digests[index], width, height, backend)
+                if mapped is not None:
+                    results[index] = (mapped, "sidecar", time.perf_counter() - started)
+                    continue
+        pending.append(index)
+
+    batch = [index for index in pending if decoders.preferred(formats[index]) == "ffmpeg"]
+    started = time.perf_counter()
+    decoded = _ffmpeg_decode_rgb_batch([paths[index] for index in batch], width, height) if len(batch) > 1 else None
     if decoded is not None:
-        return decoded
-    return _fallback_bytes(path, width, height)
+        # One process decodes the whole batch; its wall time is split evenly.
+        share = (time.perf_counter() - started) / len(batch)
+        for index, rgb in zip(batch, decoded):
+            results[index] = (rgb, "ffmpeg-batch", share)
+            decoders.record("ffmpeg", formats[index], True, share)
+    for index in pending:
+        if results[index] is None:
+            started = time.perf_counter()
+            rgb, source = decoders.decode(paths[index], width, height, formats[index])
+            results[index] = (rgb, source, time.perf_counter() - started)
+
+    for index, (rgb, source, _) in enumerate(results):
+        # A placeholder from a failed decode is not kept, so the next load tries again.
+        if keys[index] is not None and source != "fallback":
+            IMAGE_CACHE.put(keys[index], rgb)
+        if source not in ("sidecar", "fallback") and index in digests:
+            # A batched decode goes through the same ffmpeg scaler as a single one.
+            backend = "ffmpeg" if source == "ffmpeg-batch" else source
+            sidecar.store(digests[index], width, height, backend, rgb)
+    return results
+
+
+def load_rgb_image(path: Path, width: int, height: int) -> bytes | memoryview:
+    return load_rgb_images([path], width, height)[0]
+
+
+def load_rgb_images(
+    paths: list[Path],
+    width: int,
+    height: int,
+    workers: int = 1,
+    timings: list[dict[str, object]] | None = None,
+) -> list[bytes | memoryview]:
+    """Decode several images with one ffmpeg process per batch instead of one per image.
+
+    Lookups go through ``IMAGE_CACHE`` and then, when configured, ``RGB_SIDECAR_CACHE``,
+    whose hits are read-only memoryviews over the mapped sidecar. Images still missing are
+    split into up to ``workers`` contiguous shards decoded on a thread pool (ffmpeg waits and
+    zlib inflate release the GIL); results keep the order of ``paths``. Within a shard, images
+    that ``DECODERS`` routes to ffmpeg share one process; the rest, and a batch that ffmpeg
+    rejects as a whole, are decoded image by image through ``DECODERS``.
+    ``timings`` receives one ``{"path", "source", "decode_sec"}`` record per image.
+    """
+    keys = [_image_cache_key(path, width, height) for path in paths]
+    results: list[tuple[bytes | memoryview, str, float] | None] = [None] * len(paths)
+    for index, key in enumerate(keys):
+        started = time.perf_counter()
+        cached = IMAGE_CACHE.get(key) if key is not None else None
+        if cached is not None:
+            results[index] = (cached, "memory", time.perf_counter() - started)
+    pending = [index for index, result in enumerate(results) if result is None]
+
+    shard_size = min(FFMPEG_BATCH_MAX_IMAGES, max(1, -(-len(pending) // max(1, workers))))
+    shards = [pending[start : start + shard_size] for start in range(0, len(pending), shard_size)]
+    sidecar = RGB_SIDECAR_CACHE
+
+    def load(shard: list[int]) -> list[tuple[bytes | memoryview, str, float]]:
+        return _load_rgb_shard([paths[i] for i in shard], [keys[i] for i in shard], width, height, sidecar)
+
+    if workers > 1 and len(shards) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+            loaded = list(pool.map(load, shards))
+    else:
+        loaded = [load(shard) for shard in shards]
+    for shard, shard_results in zip(shards, loaded):
+        for index, result in zip(shard, shard_results):
+            results[index] = result
+
+    if timings is not None:
+        timings.extend(
+            {"path": str(path), "source": source, "decode_sec": round(elapsed, 6)}
+            for path, (_, source, elapsed) in zip(paths, results)
+        )
+    return [rgb for rgb, _, _ in results]
+
+
+def list_reference_images(reference_dir: Path, limit: int = 0) -> list[Path]:
+    images = [p for p in sorted(reference_dir.iterdir()) if p.is_file() and p.suffix.lower() in REFERENCE_IMAGE_SUFFIXES]
+    if limit > 0:
+        images = images[:limit]
+    return images
+
+
+def _parse_size(value: str) -> tuple[int, int]:
+    width, sep, height = value.lower().partition("x")
+    try:
+        size = (int(width), int(height if sep else width))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}") from None
+    if size[0] <= 0 or size[1] <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive, got {value!r}")
+    return size
+
+
+def build_warm_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Pre-decode reference images into an RGB sidecar cache.")
+    parser.add_argument("reference_dirs", nargs="+")
+    parser.add_argument("--cache-dir", required=True)
+    parser.add_argument(
+        "--size",
+        type=_parse_size,
+        action="append",
+        help="WIDTHxHEIGHT to cache (repeatable, default 224x224, the vit-hf input size)",
+    )
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_RGB_SIDECAR_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_warm_parser().parse_args(argv)
+    reference_dirs = [Path(value) for value in args.reference_dirs]
+    for reference_dir in reference_dirs:
+        if not reference_dir.is_dir():
+            print(f"ERROR: reference_dir_not_found path={reference_dir}")
+            return 1
+    if args.cache_max_mb <= 0:
+        print(f"ERROR: invalid_cache_max_mb value={args.cache_max_mb}")
+        return 1
+    if args.workers <= 0:
+        print(f"ERROR: invalid_workers value={args.workers}")
+        return 1
+    images = [path for reference_dir in reference_dirs for path in list_reference_images(reference_dir)]
+    if not images:
+        print("ERROR: no_reference_images")
+        return 1
+
+    cache = configure_rgb_sidecar_cache(Path(args.cache_dir), args.cache_max_mb * 1024 * 1024)
+    started = time.perf_counter()
+    initial = cache.stats()
+    for width, height in args.size or [(224, 224)]:
+        size_started = time.perf_counter()
+        before = cache.stats()
+        load_rgb_images(images, width, height, workers=args.workers)
+        after = cache.stats()
+        print(
+            f"METRIC: image_cache_warm size={width}x{height} images={len(images)} "
+            f"reused={after['hits'] - before['hits']} stored={after['stores'] - before['stores']} "
+            f"elapsed_sec={time.perf_counter() - size_started:.3f}"
+        )
+    stats = {name: value - initial[name] for name, value in cache.stats().items()}
+    print(
+        f"METRIC: image_cache_warm_completed cache_dir={cache.root} images={len(images)} "
+        f"reused={stats['hits']} stored={stats['stores']} evicted={stats['evictions']} "
+        f"wall_sec={time.perf_counter() - started:.3f}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,6 +6,8 @@ from pathlib import Path
 
 AUDIO_FEATURES_FILE = "audio_features.npy"
 MOUTH_LANDMARKS_FILE = "mouth_landmarks.json"
+MOUTH_LANDMARK_TRACK_FILE = "mouth_landmarks.npy"
+VOICE_ACTIVITY_FILE = "voice_activity.json"
 FRAMES_DIR = "frames"
 OUTPUT_VIDEO_FILE = "output.mp4"
 
@@ -22,6 +24,14 @@ class PipelinePaths:
     def mouth_landmarks(self) -> Path:
         return self.workspace / MOUTH_LANDMARKS_FILE
 
+    @property
+    def mouth_landmark_track(self) -> Path:
+        return self.workspace / MOUTH_LANDMARK_TRACK_FILE
+
+    @property
+    def voice_activity(self) -> Path:
+        return self.workspace / VOICE_ACTIVITY_FILE
+
     @property
     def frames(self) -> Path:
         return self.workspace / FRAMES_DIR
@@ -30,3 +40,6 @@ class PipelinePaths:
     def output_video(self) -> Path:
         return self.workspace / OUTPUT_VIDEO_FILE
 
+
+def landmark_track_path(mouth_landmarks: Path) -> Path:
+    return mouth_landmarks.with_suffix(".npy")
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import ast
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Iterator, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency path
+    np = None
+
+NPY_MAGIC = b"\x93NUMPY"
+NPY_PREAMBLE_BYTES = 10
+NPY_RESERVED_HEADER_BYTES = 128
+QUANTIZATION_SCHEMES = ("none", "float16", "uint8")
+_QUANTIZED_DESCR = {"float16": "<f2", "uint8": "|u1"}
+_ITEM_BYTES = {"<f4": 4, "<f2": 2, "|u1": 1}
+_WRITER_TYPECODES = {"<f4": "f", "<f8": "d"}
+_FLOAT16_MAX = 65504.0
+_QUANTIZE_CHUNK_ROWS = 4096
+
+
+def _shape_text(shape: tuple[int, ...]) -> str:
+    if len(shape) == 1:
+        return f"({shape[0]},)"
+    return "(" + ", ".join(str(dim) for dim in shape) + ")"
+
+
+def build_npy_header(descr: str, shape: tuple[int, ...], total_bytes: int | None = None) -> bytes:
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {_shape_text(shape)}, }}".encode("latin1")
+    if total_bytes is None:
+        pad = (16 - ((NPY_PREAMBLE_BYTES + len(header) + 1) % 16)) % 16
+    else:
+        pad = total_bytes - NPY_PREAMBLE_BYTES - len(header) - 1
+        if pad < 0:
+            raise ValueError(f"NPY shape does not fit reserved header: {shape}")
+    header_padded = header + (b" " * pad) + b"\n"
+    return NPY_MAGIC + bytes([1, 0]) + struct.pack("<H", len(header_padded)) + header_padded
+
+
+def _nested_shape(value) -> tuple[int, ...]:
+    shape: list[int] = []
+    while isinstance(value, (list, tuple)):
+        shape.append(len(value))
+        value = value[0] if value else None
+    return tuple(shape)
+
+
+def _flatten(rows, depth: int) -> list[float]:
+    values = list(rows)
+    for _ in range(depth):
+        values = [value for item in values for value in item]
+    return values
+
+
+def _pack_f32(values: Sequence[float], typecode: str = "f") -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+class NpyF32Writer:
+    """Append float32 rows (or float64 with ``descr="<f8"``) to an NPY file and patch the row count on close."""
+
+    def __init__(self, path: Path, row_shape: tuple[int, ...] | None = None, descr: str = "<f4") -> None:
+        if descr not in _WRITER_TYPECODES:
+            raise ValueError(f"Unsupported NPY writer dtype: {descr}")
+        self.path = path
+        self.row_shape = row_shape
+        self.descr = descr
+        self.rows = 0
+        self._handle = path.open("wb")
+        self._handle.write(self._header())
+
+    def _header(self) -> bytes:
+        shape = (self.rows, *(self.row_shape if self.row_shape is not None else (0,)))
+        return build_npy_header(self.descr, shape, total_bytes=NPY_RESERVED_HEADER_BYTES)
+
+    def append(self, rows) -> None:
+        if len(rows) == 0:
+            return
+        if np is not None and isinstance(rows, np.ndarray):
+            block = np.ascontiguousarray(rows, dtype=self.descr)
+            row_shape = tuple(block.shape[1:])
+            payload = block.tobytes()
+        else:
+            row_shape = _nested_shape(rows[0])
+            payload = _pack_f32(_flatten(rows, len(row_shape)), _WRITER_TYPECODES[self.descr])
+        if self.row_shape is None:
+            self.row_shape = row_shape
+        elif row_shape != self.row_shape:
+            raise ValueError(f"NPY row shape mismatch: {row_shape} != {self.row_shape}")
+        self._handle.write(payload)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        if self._handle.closed:
+            return
+        self._handle.seek(0)
+        self._handle.write(self._header())
+        self._handle.close()
+
+    def __enter__(self) -> NpyF32Writer:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def write_npy_f32_matrix(path: Path, matrix: list[list[float]]) -> None:
+    with NpyF32Writer(path) as writer:
+        writer.append(matrix)
+
+
+def read_npy_header(path: Path) -> tuple[str, tuple[int, ...], int]:
+    with path.open("rb") as handle:
+        preamble = handle.read(12)
+        if not preamble.startswith(NPY_MAGIC):
+            raise ValueError(f"Invalid NPY header: {path}")
+        version = (preamble[6], preamble[7])
+        if version == (1, 0):
+            header_len = int.from_bytes(preamble[8:10], "little")
+            offset = 10
+        elif version in ((2, 0), (3, 0)):
+            header_len = int.from_bytes(preamble[8:12], "little")
+            offset = 12
+        else:
+            raise ValueError(f"Unsupported NPY version: {version}")
+        handle.seek(offset)
+        header = handle.read(header_len).decode("latin1")
+    try:
+        meta = ast.literal_eval(header)
+    except (SyntaxError, ValueError) as exc:
+        raise ValueError(f"Invalid NPY header: {path}") from exc
+    if not isinstance(meta, dict) or "shape" not in meta or "descr" not in meta:
+        raise ValueError(f"NPY shape missing: {path}")
+    if meta.get("fortran_order"):
+        raise ValueError(f"Fortran-ordered NPY is not supported: {path}")
+    return str(meta["descr"]), tuple(int(dim) for dim in meta["shape"]), offset + header_len
+
+
+def quantization_sidecar_path(path: Path) -> Path:
+    return path.with_suffix(".quant.json")
+
+
+class NpyF32Rows:
+    """Row accessor over a memory-mapped NPY matrix; float16/uint8 rows are dequantized on access."""
+
+    def __init__(self, path: Path) -> None:
+        descr, shape, data_offset = read_npy_header(path)
+        if descr not in _ITEM_BYTES or len(shape) < 1:
+            raise ValueError(f"Unsupported NPY layout: descr={descr} shape={shape}")
+        self.path = path
+        self.descr = descr
+        self.shape = shape
+        self.row_size = 1
+        for dim in shape[1:]:
+            self.row_size *= dim
+        self._rows = shape[0]
+        self._scale: list[float] | None = None
+        self._offset: list[float] | None = None
+        if descr == "|u1":
+            meta = json.loads(quantization_sidecar_path(path).read_text(encoding="utf-8"))
+            self._scale = [float(v) for v in meta["scale"]]
+            self._offset = [float(v) for v in meta["offset"]]
+            if len(self._scale) != self.row_size or len(self._offset) != self.row_size:
+                raise ValueError(f"Quantization sidecar does not match {path}")
+        self._array = None
+        self._mapped: mmap.mmap | None = None
+        self._view: memoryview | None = None
+
+        count = self._rows * self.row_size
+        if np is not None:
+            self._array = np.load(path, mmap_mode="r").reshape(self._rows, self.row_size)
+            if self._scale is not None:
+                self._scale = np.asarray(self._scale, dtype=np.float64)
+                self._offset = np.asarray(self._offset, dtype=np.float64)
+        elif count > 0:
+            with path.open("rb") as handle:
+                self._mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mapped)[data_offset : data_offset + count * _ITEM_BYTES[descr]]
+            if descr == "|u1" or (descr == "<f4" and sys.byteorder == "little"):
+                self._view = self._view.cast("B" if descr == "|u1" else "f")
+
+    @property
+    def quantization(self) -> str:
+        return {"<f2": "float16", "|u1": "uint8"}.get(self.descr, "none")
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __getitem__(self, index: int) -> list[float]:
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError(f"NPY row out of range: {index}")
+        if self._array is not None:
+            row = self._array[index]
+            if self._scale is not None:
+                return (row * self._scale + self._offset).tolist()
+            return row.astype(np.float64).tolist()
+        if self._view is None:
+            return []
+        start = index * self.row_size
+        if self.descr == "|u1":
+            row = self._view[start : start + self.row_size]
+            return [q * scale + offset for q, scale, offset in zip(row, self._scale, self._offset)]
+        if self._view.format == "f":
+            return self._view[start : start + self.row_size].tolist()
+        item = _ITEM_BYTES[self.descr]
+        chunk = self._view[start * item : (start + self.row_size) * item]
+        code = "e" if self.descr == "<f2" else "f"
+        return list(struct.unpack(f"<{self.row_size}{code}", chunk))
+
+    def iter_column(self, column: int) -> Iterator[float]:
+        """Yield one column top to bottom, reading ``_QUANTIZE_CHUNK_ROWS`` rows per block."""
+        if not 0 <= column < self.row_size:
+            raise IndexError(f"NPY column out of range: {column}")
+        for lo in range(0, self._rows, _QUANTIZE_CHUNK_ROWS):
+            hi = min(self._rows, lo + _QUANTIZE_CHUNK_ROWS)
+            if self._array is not None:
+                values = self._array[lo:hi, column].astype(np.float64)
+                if self._scale is not None:
+                    values = values * self._scale[column] + self._offset[column]
+                yield from values.tolist()
+            elif self.descr == "|u1":
+                scale, offset = self._scale[column], self._offset[column]
+                for q in self._view[lo * self.row_size + column : hi * self.row_size : self.row_size]:
+                    yield q * scale + offset
+            elif self._view.format == "f":
+                yield from self._view[lo * self.row_size + column : hi * self.row_size : self.row_size].tolist()
+            else:
+                item = _ITEM_BYTES[self.descr]
+                code = "e" if self.descr == "<f2" else "f"
+                block = self._view[lo * self.row_size * item : hi * self.row_size * item]
+                yield from struct.unpack(f"<{(hi - lo) * self.row_size}{code}", block)[column :: self.row_size]
+
+    def close(self) -> None:
+        self._array = None
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    def __enter__(self) -> NpyF32Rows:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def open_npy_f32_rows(path: Path) -> NpyF32Rows:
+    return NpyF32Rows(path)
+
+
+def read_npy_f32_matrix(path: Path) -> list[list[float]]:
+    with open_npy_f32_rows(path) as rows:
+        return [rows[i] for i in range(len(rows))]
+
+
+def _column_ranges(rows: NpyF32Rows) -> tuple[list[float], list[float]]:
+    if len(rows) == 0:
+        return [0.0] * rows.row_size, [0.0] * rows.row_size
+    if rows._array is not None:
+        return rows._array.min(axis=0).astype(np.float64).tolist(), rows._array.max(axis=0).astype(np.float64).tolist()
+    low = [math.inf] * rows.row_size
+    high = [-math.inf] * rows.row_size
+    for index in range(len(rows)):
+        for column, value in enumerate(rows[index]):
+            low[column] = min(low[column], value)
+            high[column] = max(high[column], value)
+    return low, high
+
+
+def _quantize_chunk(rows: NpyF32Rows, lo: int, hi: int, scheme: str, scale, offset) -> bytes:
+    if rows._array is not None:
+        block = rows._array[lo:hi].astype(np.float64)
+        if scheme == "float16":
+            return np.clip(block, -_FLOAT16_MAX, _FLOAT16_MAX).astype("<f2").tobytes()
+        return np.clip(np.rint((block - offset) / scale), 0, 255).astype(np.uint8).tobytes()
+    payload = bytearray()
+    for index in range(lo, hi):
+        row = rows[index]
+        if scheme == "float16":
+            clipped = [min(_FLOAT16_MAX, max(-_FLOAT16_MAX, value)) for value in row]
+            payload.extend(struct.pack(f"<{len(row)}e", *clipped))
+        else:
+            payload.extend(
+                min(255, max(0, round((value - low) / step))) for value, low, step in zip(row, offset, scale)
+            )
+    return bytes(payload)
+
+
+def quantize_npy_f32(source: Path, destination: Path, scheme: str) -> dict[str, object]:
+    """Rewrite a float32 NPY matrix as float16, or uint8 with a per-column scale/offset sidecar."""
+    if scheme not in _QUANTIZED_DESCR:
+        raise ValueError(f"Unknown quantization scheme: {scheme}")
+    sidecar = quantization_sidecar_path(destination)
+    meta: dict[str, object] = {"scheme": scheme}
+    fd, tmp_name = tempfile.mkstemp(dir=destination.parent, suffix=".npy.tmp")
+    try:
+        with open_npy_f32_rows(source) as rows, os.fdopen(fd, "wb") as handle:
+            if rows.descr != "<f4":
+                raise ValueError(f"Quantization expects a float32 matrix: {source}")
+            scale = offset = None
+            if scheme == "uint8":
+                low, high = _column_ranges(rows)
+                # A constant column keeps scale 0 and decodes to its offset exactly.
+                meta["offset"] = low
+                meta["scale"] = [(top - bottom) / 255.0 for bottom, top in zip(low, high)]
+                offset = meta["offset"]
+                scale = [step if step > 0.0 else 1.0 for step in meta["scale"]]
+                if np is not None:
+                    offset = np.asarray(offset, dtype=np.float64)
+                    scale = np.asarray(scale, dtype=np.float64)
+            handle.write(build_npy_header(_QUANTIZED_DESCR[scheme], rows.shape))
+            for lo in range(0, len(rows), _QUANTIZE_CHUNK_ROWS):
+                handle.write(_quantize_chunk(rows, lo, min(len(rows), lo + _QUANTIZE_CHUNK_ROWS), scheme, scale, offset))
+        if scheme == "uint8":
+            sidecar.write_text(json.dumps(meta, ensure_ascii=True), encoding="utf-8")
+        else:
+            sidecar.unlink(missing_ok=True)
+        os.replace(tmp_name, destination)
+    finally:
+        Path(tmp_name).unlink(missing_ok=True)
+    return meta
+
+
+def write_npy_quantized_matrix(path: Path, matrix: list[list[float]], scheme: str) -> dict[str, object]:
+    write_npy_f32_matrix(path, matrix)
+    return quantize_npy_f32(path, path, scheme)
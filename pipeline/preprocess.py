@@ -1,88 +1,506 @@
 from __future__ import annotations
 
+import argparse
 import json
 import math
+import mmap
+import os
 import struct
-import wave
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from functools import lru_cache, partial
 from pathlib import Path
+from typing import Iterable, Iterator, Sequence
 
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-def write_npy_f32_matrix(path: Path, matrix: list[list[float]]) -> None:
-    rows = len(matrix)
-    cols = len(matrix[0]) if rows else 0
-    values = [value for row in matrix for value in row]
-    header_dict = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({rows}, {cols}), }}"
-    header = header_dict.encode("latin1")
+from pipeline.interfaces import landmark_track_path
+from pipeline.npy_io import NpyF32Writer, open_npy_f32_rows, write_npy_f32_matrix  # noqa: F401 - re-exported
+from pipeline.postprocess import ffmpeg_available
 
-    preamble_len = 10
-    pad = (16 - ((preamble_len + len(header) + 1) % 16)) % 16
-    header_padded = header + (b" " * pad) + b"\n"
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency path
+    np = None
 
-    raw = bytearray()
-    raw.extend(b"\x93NUMPY")
-    raw.extend(bytes([1, 0]))
-    raw.extend(struct.pack("<H", len(header_padded)))
-    raw.extend(header_padded)
-    if values:
-        raw.extend(struct.pack("<" + ("f" * len(values)), *values))
-    path.write_bytes(bytes(raw))
+FEATURE_ENGINES = ("auto", "numpy", "python")
+FEATURE_SETS = ("basic", "spectral")
+BASIC_FEATURE_DIM = 3
+DEFAULT_N_MELS = 40
+_LOG_MEL_FLOOR = 1e-10
+AUDIO_INPUT_MODES = ("stream", "mmap")
+_NUMPY_WINDOW_BATCH = 4096
+WAV_BLOCK_FRAMES = 65536
+FFMPEG_ANALYSIS_RATE = 16000
+_FFMPEG_STDERR_TAIL_BYTES = 4096
+_SHARD_MIN_ROWS = 256
+_SHARD_MAX_ROWS = 4096
+_RESAMPLE_ZERO_CROSSINGS = 8
+_RESAMPLE_BATCH = 4096
+_RESAMPLE_STRIDED_MIN_RUN = 512
+VAD_RMS_THRESHOLD = 0.01
+VAD_MIN_SILENT_ROWS = 3
 
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+_PCM_SCALES = {1: 128.0, 2: 32768.0, 3: 8388608.0, 4: 2147483648.0}
+_FLOAT_TYPECODES = {4: "f", 8: "d"}
 
-def _decode_pcm_frames(raw: bytes, channels: int, sample_width: int) -> list[float]:
-    if sample_width == 1:
-        unpacked = struct.unpack("<" + ("B" * len(raw)), raw)
-        mono = [(value - 128) / 128.0 for value in unpacked]
+
+@dataclass(frozen=True)
+class WavInfo:
+    sample_rate: int
+    channels: int
+    sample_width: int
+    sample_format: str
+    data_offset: int
+    data_size: int
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def frame_count(self) -> int:
+        return self.data_size // max(1, self.block_align)
+
+
+def read_wav_info(path: Path) -> WavInfo:
+    with path.open("rb") as handle:
+        riff = handle.read(12)
+        if len(riff) < 12 or riff[0:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError(f"Not a RIFF/WAVE file: {path}")
+
+        fmt: tuple[int, int, int, int] | None = None
+        while True:
+            header = handle.read(8)
+            if len(header) < 8:
+                break
+            chunk_id = header[0:4]
+            chunk_size = int.from_bytes(header[4:8], "little")
+            if chunk_id == b"fmt ":
+                body = handle.read(chunk_size)
+                if len(body) < 16:
+                    raise ValueError(f"Truncated WAV fmt chunk: {path}")
+                format_tag, channels, sample_rate, _, block_align, _ = struct.unpack("<HHIIHH", body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    format_tag = int.from_bytes(body[24:26], "little")
+                if chunk_size & 1:
+                    handle.seek(1, 1)
+                fmt = (format_tag, channels, sample_rate, block_align)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"WAV data chunk precedes fmt chunk: {path}")
+                format_tag, channels, sample_rate, block_align = fmt
+                if channels <= 0 or block_align % channels != 0:
+                    raise ValueError(f"Invalid WAV channel layout: {path}")
+                sample_width = block_align // channels
+                if format_tag == WAVE_FORMAT_PCM and sample_width in _PCM_SCALES:
+                    sample_format = "pcm"
+                elif format_tag == WAVE_FORMAT_IEEE_FLOAT and sample_width in _FLOAT_TYPECODES:
+                    sample_format = "float"
+                elif format_tag in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+                    raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+                else:
+                    raise ValueError(f"Unsupported WAV format tag: {format_tag}")
+                data_offset = handle.tell()
+                # Streaming writers may leave the size unset; never read past the file.
+                available = os.fstat(handle.fileno()).st_size - data_offset
+                return WavInfo(
+                    sample_rate=sample_rate,
+                    channels=channels,
+                    sample_width=sample_width,
+                    sample_format=sample_format,
+                    data_offset=data_offset,
+                    data_size=max(0, min(chunk_size, available)),
+                )
+            else:
+                handle.seek(chunk_size + (chunk_size & 1), 1)
+    raise ValueError(f"WAV data chunk missing: {path}")
+
+
+def _little_endian_view(raw: bytes, typecode: str) -> memoryview | array:
+    if sys.byteorder == "little":
+        return memoryview(raw).cast(typecode)
+    values = array(typecode)
+    values.frombytes(raw)
+    values.byteswap()
+    return values
+
+
+def _widen_pcm24(raw: bytes) -> bytes:
+    # Place each 3-byte sample in the top of a 4-byte slot: value << 8 as int32.
+    widened = bytearray((len(raw) // 3) * 4)
+    widened[1::4] = raw[0::3]
+    widened[2::4] = raw[1::3]
+    widened[3::4] = raw[2::3]
+    return bytes(widened)
+
+
+def _decode_pcm_frames(
+    raw: bytes,
+    channels: int,
+    sample_width: int,
+    sample_format: str = "pcm",
+) -> list[float]:
+    frame_bytes = channels * sample_width
+    raw = raw[: len(raw) - (len(raw) % frame_bytes)] if frame_bytes else raw
+    if sample_format == "float":
+        if sample_width not in _FLOAT_TYPECODES:
+            raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+        mono = list(_little_endian_view(raw, _FLOAT_TYPECODES[sample_width]))
+    elif sample_width == 1:
+        mono = [(value - 128) / 128.0 for value in memoryview(raw)]
     elif sample_width == 2:
-        unpacked = struct.unpack("<" + ("h" * (len(raw) // 2)), raw)
-        mono = [value / 32768.0 for value in unpacked]
+        mono = [value / 32768.0 for value in _little_endian_view(raw, "h")]
+    elif sample_width == 3:
+        mono = [value / 2147483648.0 for value in _little_endian_view(_widen_pcm24(raw), "i")]
     elif sample_width == 4:
-        unpacked = struct.unpack("<" + ("i" * (len(raw) // 4)), raw)
-        mono = [value / 2147483648.0 for value in unpacked]
+        mono = [value / 2147483648.0 for value in _little_endian_view(raw, "i")]
     else:
         raise ValueError(f"Unsupported WAV sample width: {sample_width}")
 
     if channels == 1:
         return mono
+    lanes = [mono[channel::channels] for channel in range(channels)]
+    return [sum(frame) / float(channels) for frame in zip(*lanes)]
 
-    frames: list[float] = []
-    for idx in range(0, len(mono), channels):
-        chunk = mono[idx : idx + channels]
-        if not chunk:
-            continue
-        frames.append(sum(chunk) / float(len(chunk)))
-    return frames
+
+def _decode_pcm_frames_numpy(
+    raw: bytes,
+    channels: int,
+    sample_width: int,
+    sample_format: str = "pcm",
+):
+    frame_bytes = channels * sample_width
+    usable = len(raw) - (len(raw) % frame_bytes)
+    if sample_format == "float":
+        if sample_width not in _FLOAT_TYPECODES:
+            raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+        mono = np.frombuffer(raw, dtype=f"<f{sample_width}", count=usable // sample_width).astype(np.float64)
+    elif sample_width == 3:
+        triplets = np.frombuffer(raw, dtype=np.uint8, count=usable).reshape(-1, 3).astype(np.int32)
+        values = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+        values = np.where(values >= 0x800000, values - 0x1000000, values)
+        mono = values / 8388608.0
+    elif sample_width in _PCM_SCALES:
+        dtype = "u1" if sample_width == 1 else f"<i{sample_width}"
+        values = np.frombuffer(raw, dtype=dtype, count=usable // sample_width)
+        if sample_width == 1:
+            mono = (values.astype(np.float64) - 128.0) / 128.0
+        else:
+            mono = values / _PCM_SCALES[sample_width]
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+
+    if channels == 1:
+        return mono
+    lanes = mono.reshape(-1, channels)
+    total = lanes[:, 0].copy()
+    for channel in range(1, channels):
+        total += lanes[:, channel]
+    return total / float(channels)
+
+
+def _decode_wav_block(raw: bytes, info: WavInfo, use_numpy: bool):
+    decode = _decode_pcm_frames_numpy if use_numpy else _decode_pcm_frames
+    return decode(raw, channels=info.channels, sample_width=info.sample_width, sample_format=info.sample_format)
 
 
 def read_wav_mono(path: Path) -> tuple[int, list[float]]:
-    with wave.open(str(path), "rb") as handle:
-        channels = handle.getnchannels()
-        sample_width = handle.getsampwidth()
-        sample_rate = handle.getframerate()
-        raw = handle.readframes(handle.getnframes())
-    return sample_rate, _decode_pcm_frames(raw, channels=channels, sample_width=sample_width)
+    info = read_wav_info(path)
+    with path.open("rb") as handle:
+        handle.seek(info.data_offset)
+        raw = handle.read(info.data_size)
+    return info.sample_rate, _decode_wav_block(raw, info, use_numpy=False)
 
 
-def extract_audio_features(
-    input_audio: Path,
-    output_npy: Path,
-    window_ms: float = 25.0,
-    hop_ms: float = 10.0,
-) -> int:
-    sample_rate, samples = read_wav_mono(input_audio)
-    if not samples:
-        matrix = [[0.0, 0.0, 0.0]]
-        write_npy_f32_matrix(output_npy, matrix)
-        return 1
+def iter_wav_mono_blocks(
+    path: Path,
+    block_frames: int = WAV_BLOCK_FRAMES,
+    engine: str = "python",
+    info: WavInfo | None = None,
+) -> Iterator[list[float]]:
+    info = info or read_wav_info(path)
+    use_numpy = resolve_feature_engine(engine) == "numpy"
+    block_bytes = max(1, block_frames) * info.block_align
+    remaining = info.data_size
+    with path.open("rb") as handle:
+        handle.seek(info.data_offset)
+        while remaining > 0:
+            raw = handle.read(min(block_bytes, remaining))
+            if not raw:
+                return
+            remaining -= len(raw)
+            yield _decode_wav_block(raw, info, use_numpy)
 
-    window = max(1, int(sample_rate * (window_ms / 1000.0)))
-    hop = max(1, int(sample_rate * (hop_ms / 1000.0)))
-    if len(samples) < window:
-        starts = [0]
-    else:
-        starts = list(range(0, len(samples) - window + 1, hop))
-        if not starts:
-            starts = [0]
 
+def iter_wav_mono_blocks_mmap(
+    path: Path,
+    block_frames: int = WAV_BLOCK_FRAMES,
+    engine: str = "python",
+    info: WavInfo | None = None,
+) -> Iterator[list[float]]:
+    info = info or read_wav_info(path)
+    use_numpy = resolve_feature_engine(engine) == "numpy"
+    if info.data_size <= 0:
+        return
+    block_bytes = max(1, block_frames) * info.block_align
+    end = info.data_offset + info.data_size
+    # A read-only shared mapping lets concurrent jobs on the same source reuse page cache.
+    with path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        try:
+            for start in range(info.data_offset, end, block_bytes):
+                with view[start : min(start + block_bytes, end)] as raw:
+                    block = _decode_wav_block(raw, info, use_numpy)
+                yield block
+        finally:
+            view.release()
+
+
+def iter_audio_blocks(
+    path: Path,
+    block_frames: int = WAV_BLOCK_FRAMES,
+    engine: str = "python",
+    input_mode: str = "stream",
+    info: WavInfo | None = None,
+) -> Iterator[list[float]]:
+    if input_mode == "mmap":
+        return iter_wav_mono_blocks_mmap(path, block_frames=block_frames, engine=engine, info=info)
+    if input_mode == "stream":
+        return iter_wav_mono_blocks(path, block_frames=block_frames, engine=engine, info=info)
+    raise ValueError(f"Unknown audio input mode: {input_mode}")
+
+
+def is_wav_file(path: Path) -> bool:
+    with path.open("rb") as handle:
+        head = handle.read(12)
+    return len(head) == 12 and head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+
+
+def iter_ffmpeg_mono_blocks(
+    path: Path,
+    sample_rate: int = FFMPEG_ANALYSIS_RATE,
+    block_frames: int = WAV_BLOCK_FRAMES,
+    engine: str = "python",
+) -> Iterator[list[float]]:
+    if not ffmpeg_available():
+        raise RuntimeError(f"ffmpeg unavailable for audio decoding: {path}")
+    use_numpy = resolve_feature_engine(engine) == "numpy"
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-v",
+        "error",
+        "-i",
+        str(path),
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "-f",
+        "s16le",
+        "-acodec",
+        "pcm_s16le",
+        "-",
+    ]
+    info = WavInfo(
+        sample_rate=sample_rate,
+        channels=1,
+        sample_width=2,
+        sample_format="pcm",
+        data_offset=0,
+        data_size=0,
+    )
+    block_bytes = max(1, block_frames) * 2
+    # stderr goes to a file rather than a pipe: a damaged input can log far more than a pipe
+    # buffer holds, and ffmpeg would then block on stderr while we block on stdout.
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            carry = b""
+            while True:
+                chunk = process.stdout.read(block_bytes)
+                if not chunk:
+                    break
+                raw = carry + chunk
+                usable = len(raw) - (len(raw) % 2)
+                carry = raw[usable:]
+                if usable:
+                    yield _decode_wav_block(raw[:usable], info, use_numpy)
+            if process.wait() != 0:
+                stderr_file.seek(max(0, stderr_file.seek(0, os.SEEK_END) - _FFMPEG_STDERR_TAIL_BYTES))
+                stderr = stderr_file.read().decode("utf-8", errors="replace").strip()
+                raise RuntimeError(f"ffmpeg audio decode failed: path={path} detail={stderr}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def resolve_feature_engine(engine: str) -> str:
+    if engine not in FEATURE_ENGINES:
+        raise ValueError(f"Unknown feature engine: {engine}")
+    if engine == "auto":
+        return "numpy" if np is not None else "python"
+    if engine == "numpy" and np is None:
+        raise RuntimeError("numpy unavailable for feature engine")
+    return engine
+
+
+@dataclass(frozen=True)
+class ResamplePlan:
+    up: int
+    down: int
+    half_width: int
+    # phases[r][j] multiplies x[kmax - j] for outputs whose filter phase is r.
+    phases: tuple[tuple[float, ...], ...]
+
+    @property
+    def taps_per_phase(self) -> int:
+        return len(self.phases[0])
+
+    def newest_input(self, output_index: int) -> int:
+        return (self.half_width + output_index * self.down) // self.up
+
+    def output_length(self, input_length: int) -> int:
+        return -(-input_length * self.up // self.down)
+
+
+@lru_cache(maxsize=None)
+def resample_plan(source_rate: int, target_rate: int) -> ResamplePlan:
+    common = math.gcd(source_rate, target_rate)
+    up = target_rate // common
+    down = source_rate // common
+    # Blackman-windowed sinc low-pass at the narrower of the two Nyquist limits.
+    stretch = max(up, down)
+    half_width = _RESAMPLE_ZERO_CROSSINGS * stretch
+    taps = []
+    for n in range(-half_width, half_width + 1):
+        x = n / stretch
+        sinc = 1.0 if n == 0 else math.sin(math.pi * x) / (math.pi * x)
+        phase = math.pi * n / (half_width + 1)
+        window = 0.42 + 0.5 * math.cos(phase) + 0.08 * math.cos(2.0 * phase)
+        taps.append(sinc * window)
+    per_phase = -(-len(taps) // up)
+    phases = []
+    for r in range(up):
+        phase_taps = [taps[r + j * up] if r + j * up < len(taps) else 0.0 for j in range(per_phase)]
+        total = sum(phase_taps)
+        phases.append(tuple(tap / total for tap in phase_taps) if total else tuple(phase_taps))
+    return ResamplePlan(up=up, down=down, half_width=half_width, phases=tuple(phases))
+
+
+def _resample_span(plan: ResamplePlan, out_lo: int, out_hi: int) -> tuple[int, int]:
+    return plan.newest_input(out_lo) - plan.taps_per_phase + 1, plan.newest_input(out_hi - 1) + 1
+
+
+def _polyphase_outputs(samples, base: int, plan: ResamplePlan, out_lo: int, out_hi: int, use_numpy: bool):
+    # Both engines accumulate taps in the same order so their outputs are bit-identical.
+    if use_numpy and out_hi - out_lo >= plan.up * _RESAMPLE_STRIDED_MIN_RUN:
+        # Outputs m, m + up, m + 2*up, ... share a filter phase and read inputs `down`
+        # apart, so each tap multiplies a strided view instead of a gathered copy.
+        outputs = np.empty(out_hi - out_lo, dtype=np.float64)
+        for offset in range(plan.up):
+            position = plan.half_width + (out_lo + offset) * plan.down
+            newest = position // plan.up - base
+            count = -(-(out_hi - out_lo - offset) // plan.up)
+            span = (count - 1) * plan.down + 1
+            acc = np.zeros(count, dtype=np.float64)
+            for j, tap in enumerate(plan.phases[position % plan.up]):
+                acc += tap * samples[newest - j : newest - j + span : plan.down]
+            outputs[offset :: plan.up] = acc
+        return outputs
+    if use_numpy:
+        table = _numpy_phase_table(plan.up, plan.down)
+        outputs = np.empty(max(0, out_hi - out_lo), dtype=np.float64)
+        for lo in range(out_lo, out_hi, _RESAMPLE_BATCH):
+            hi = min(out_hi, lo + _RESAMPLE_BATCH)
+            position = plan.half_width + np.arange(lo, hi, dtype=np.int64) * plan.down
+            newest = position // plan.up - base
+            taps = table[position % plan.up]
+            acc = np.zeros(hi - lo, dtype=np.float64)
+            for j in range(plan.taps_per_phase):
+                acc += taps[:, j] * samples[newest - j]
+            outputs[lo - out_lo : hi - out_lo] = acc
+        return outputs
+
+    outputs = []
+    for m in range(out_lo, out_hi):
+        position = plan.half_width + m * plan.down
+        newest = position // plan.up - base
+        acc = 0.0
+        for j, tap in enumerate(plan.phases[position % plan.up]):
+            acc += tap * samples[newest - j]
+        outputs.append(acc)
+    return outputs
+
+
+@lru_cache(maxsize=None)
+def _numpy_phase_table(up: int, down: int):
+    return np.asarray(resample_plan(down, up).phases, dtype=np.float64)
+
+
+def _zeros(count: int, use_numpy: bool):
+    return np.zeros(count, dtype=np.float64) if use_numpy else [0.0] * count
+
+
+def iter_resampled_blocks(
+    blocks: Iterable[list[float]],
+    source_rate: int,
+    target_rate: int,
+    engine: str = "python",
+) -> Iterator[list[float]]:
+    plan = resample_plan(source_rate, target_rate)
+    use_numpy = resolve_feature_engine(engine) == "numpy"
+    taps = plan.taps_per_phase
+    # Samples before the clip start are zero; the buffer starts with that padding.
+    buffer = _zeros(taps, use_numpy)
+    base = -taps
+    seen = 0
+    produced = 0
+    for block in blocks:
+        buffer = _append_samples(buffer, block, use_numpy)
+        seen += len(block)
+        ready = max(produced, -(-(seen * plan.up - plan.half_width) // plan.down))
+        if ready > produced:
+            yield _polyphase_outputs(buffer, base, plan, produced, ready, use_numpy)
+            produced = ready
+        keep_from = plan.newest_input(produced) - taps + 1
+        buffer = buffer[keep_from - base :]
+        base = keep_from
+
+    total = plan.output_length(seen)
+    if total > produced:
+        buffer = _append_samples(buffer, _zeros(taps, use_numpy), use_numpy)
+        yield _polyphase_outputs(buffer, base, plan, produced, total, use_numpy)
+
+
+def _window_starts(sample_count: int, window: int, hop: int) -> range:
+    if sample_count < window:
+        return range(0, 1)
+    return range(0, sample_count - window + 1, hop)
+
+
+def _window_features_python(samples: list[float], starts: Sequence[int], window: int) -> list[list[float]]:
     matrix: list[list[float]] = []
     for start in starts:
         frame = samples[start : start + window]
@@ -97,46 +515,586 @@ def extract_audio_features(
                 zero_crossings += 1
         zcr = zero_crossings / max(1, n - 1)
         matrix.append([rms, zcr, mean_abs])
+    return matrix
 
-    if not matrix:
-        matrix = [[0.0, 0.0, 0.0]]
-    write_npy_f32_matrix(output_npy, matrix)
-    return len(matrix)
 
+def _window_features_numpy(samples, starts: Sequence[int], window: int) -> list[list[float]]:
+    return _window_feature_matrix_numpy(samples, starts, window).tolist()
+
+
+def _window_feature_matrix_numpy(samples, starts: Sequence[int], window: int):
+    values = np.asarray(samples, dtype=np.float64)
+    if len(values) == 0 or len(starts) == 0:
+        return np.empty((0, BASIC_FEATURE_DIM), dtype=np.float64)
+    n = min(window, len(values))
+    views = np.lib.stride_tricks.sliding_window_view(values, n)
+    first = np.asarray(starts, dtype=np.int64)
+
+    # Sign changes between neighbours; a prefix sum turns per-window counts into two lookups.
+    negative = values < 0
+    crossings = np.zeros(len(values), dtype=np.int64)
+    np.cumsum(negative[1:] != negative[:-1], out=crossings[1:])
+    zcr = (crossings[first + n - 1] - crossings[first]) / float(max(1, n - 1))
+
+    rms = np.empty(len(first), dtype=np.float64)
+    mean_abs = np.empty(len(first), dtype=np.float64)
+    for lo in range(0, len(first), _NUMPY_WINDOW_BATCH):
+        if isinstance(starts, range):
+            batch = views[starts[lo] : starts[lo] + _NUMPY_WINDOW_BATCH * starts.step : starts.step]
+            batch = batch[: len(first) - lo]
+        else:
+            batch = views[first[lo : lo + _NUMPY_WINDOW_BATCH]]
+        rms[lo : lo + len(batch)] = np.sqrt(np.einsum("ij,ij->i", batch, batch) / n)
+        mean_abs[lo : lo + len(batch)] = np.abs(batch).sum(axis=1) / n
+    return np.column_stack((rms, zcr, mean_abs))
+
+
+def _hz_to_mel(hz: float) -> float:
+    return 2595.0 * math.log10(1.0 + hz / 700.0)
+
+
+def _mel_to_hz(mel: float) -> float:
+    return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+
+@lru_cache(maxsize=32)
+def _spectral_matrices(sample_rate: int, window: int, n_mels: int):
+    # Hann window, FFT size, and an HTK-style triangular mel filterbank [n_mels, n_fft // 2 + 1].
+    n_fft = 1 << max(0, (window - 1).bit_length())
+    hann = np.hanning(window + 2)[1:-1] if window > 1 else np.ones(1)
+    bin_hz = np.arange(n_fft // 2 + 1, dtype=np.float64) * sample_rate / n_fft
+    top = _hz_to_mel(sample_rate / 2.0)
+    edges = np.array([_mel_to_hz(top * i / (n_mels + 1)) for i in range(n_mels + 2)])
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bin_hz[None, :] - lower) / np.maximum(centre - lower, 1e-12)
+    falling = (upper - bin_hz[None, :]) / np.maximum(upper - centre, 1e-12)
+    filterbank = np.maximum(0.0, np.minimum(rising, falling))
+    return hann, n_fft, filterbank
+
+
+def _window_features_spectral(
+    samples,
+    starts: Sequence[int],
+    window: int,
+    sample_rate: int,
+    n_mels: int,
+) -> list[list[float]]:
+    values = np.asarray(samples, dtype=np.float64)
+    basic = _window_feature_matrix_numpy(values, starts, window)
+    if len(basic) == 0:
+        return []
+    n = min(window, len(values))
+    hann, n_fft, filterbank = _spectral_matrices(sample_rate, n, n_mels)
+    views = np.lib.stride_tricks.sliding_window_view(values, n)
+    first = np.asarray(starts, dtype=np.int64)
+    log_mel = np.empty((len(first), n_mels), dtype=np.float64)
+    for lo in range(0, len(first), _NUMPY_WINDOW_BATCH):
+        frames = views[first[lo : lo + _NUMPY_WINDOW_BATCH]] * hann
+        power = np.abs(np.fft.rfft(frames, n=n_fft, axis=1)) ** 2
+        log_mel[lo : lo + len(frames)] = np.log(power @ filterbank.T + _LOG_MEL_FLOOR)
+    return np.hstack((basic, log_mel)).tolist()
+
+
+def feature_dim(feature_set: str = "basic", n_mels: int = DEFAULT_N_MELS) -> int:
+    return BASIC_FEATURE_DIM + (n_mels if feature_set == "spectral" else 0)
+
+
+def resolve_feature_set(feature_set: str, engine: str) -> str:
+    if feature_set not in FEATURE_SETS:
+        raise ValueError(f"Unknown feature set: {feature_set}")
+    if feature_set == "spectral" and resolve_feature_engine(engine) != "numpy":
+        raise RuntimeError("spectral features require the numpy feature engine")
+    return feature_set
+
+
+def _feature_compute(engine: str, feature_set: str, sample_rate: int, n_mels: int):
+    if resolve_feature_set(feature_set, engine) == "spectral":
+        return partial(_window_features_spectral, sample_rate=sample_rate, n_mels=n_mels)
+    if resolve_feature_engine(engine) == "numpy":
+        return _window_features_numpy
+    return _window_features_python
+
+
+def _window_geometry(sample_rate: int, window_ms: float, hop_ms: float) -> tuple[int, int]:
+    window = max(1, int(sample_rate * (window_ms / 1000.0)))
+    hop = max(1, int(sample_rate * (hop_ms / 1000.0)))
+    return window, hop
+
+
+def _append_samples(buffer, block, use_numpy: bool):
+    if use_numpy:
+        return np.concatenate((buffer, np.asarray(block, dtype=np.float64)))
+    return buffer + list(block)
+
+
+def _iter_hop_rows(blocks, window: int, hop: int, compute, use_numpy: bool) -> Iterator[list[list[float]]]:
+    # Only the tail that can still start a window is carried into the next block,
+    # so memory stays bounded by the block size regardless of clip length.
+    buffer = np.empty(0, dtype=np.float64) if use_numpy else []
+    skip = 0
+    emitted = False
+    for block in blocks:
+        if skip:
+            dropped = min(skip, len(block))
+            block = block[dropped:]
+            skip -= dropped
+        buffer = _append_samples(buffer, block, use_numpy)
+        if len(buffer) < window:
+            continue
+        count = (len(buffer) - window) // hop + 1
+        yield compute(buffer, range(0, count * hop, hop), window)
+        emitted = True
+        next_start = count * hop
+        skip = max(0, next_start - len(buffer))
+        buffer = buffer[next_start:]
+
+    if not emitted and len(buffer) > 0:
+        yield compute(buffer, _window_starts(len(buffer), window, hop), window)
 
-def get_image_size(path: Path) -> tuple[int, int]:
-    raw = path.read_bytes()
-    if raw.startswith(b"\x89PNG\r\n\x1a\n") and len(raw) >= 24:
-        width = int.from_bytes(raw[16:20], "big")
-        height = int.from_bytes(raw[20:24], "big")
-        return width, height
-
-    if raw.startswith(b"\xff\xd8"):
-        i = 2
-        while i + 9 < len(raw):
-            if raw[i] != 0xFF:
-                i += 1
-                continue
-            marker = raw[i + 1]
-            if marker in (0xC0, 0xC1, 0xC2, 0xC3):
-                block_len = int.from_bytes(raw[i + 2 : i + 4], "big")
-                if block_len < 7:
-                    break
-                height = int.from_bytes(raw[i + 5 : i + 7], "big")
-                width = int.from_bytes(raw[i + 7 : i + 9], "big")
-                return width, height
-            block_len = int.from_bytes(raw[i + 2 : i + 4], "big")
-            if block_len <= 0:
-                break
-            i += 2 + block_len
 
-    raise ValueError(f"Unsupported image format for size detection: {path}")
+def _iter_frame_aligned_rows(
+    blocks,
+    sample_rate: int,
+    window: int,
+    fps: int,
+    compute,
+    use_numpy: bool,
+) -> Iterator[list[list[float]]]:
+    # Row k is the window centred on video frame k's timestamp; windows that would run
+    # past either end of the clip are shifted inside it, so there is one row per frame.
+    def unclamped_start(k: int) -> int:
+        return max(0, (k * sample_rate) // fps - window // 2)
+
+    buffer = np.empty(0, dtype=np.float64) if use_numpy else []
+    base = 0
+    seen = 0
+    k = 0
+    for block in blocks:
+        buffer = _append_samples(buffer, block, use_numpy)
+        seen += len(block)
+        starts: list[int] = []
+        while unclamped_start(k) + window <= seen:
+            starts.append(unclamped_start(k) - base)
+            k += 1
+        if starts:
+            yield compute(buffer, starts, window)
+        keep_from = max(base, min(unclamped_start(k), seen - window))
+        buffer = buffer[keep_from - base :]
+        base = keep_from
+
+    total_rows = (seen * fps + sample_rate - 1) // sample_rate
+    last_start = max(0, seen - window)
+    starts = [min(unclamped_start(row), last_start) - base for row in range(k, total_rows)]
+    if starts:
+        yield compute(buffer, starts, window)
+
+
+def iter_feature_rows(
+    blocks: Iterable[list[float]],
+    sample_rate: int,
+    window_ms: float = 25.0,
+    hop_ms: float = 10.0,
+    engine: str = "auto",
+    frame_fps: int | None = None,
+    feature_set: str = "basic",
+    n_mels: int = DEFAULT_N_MELS,
+) -> Iterator[list[list[float]]]:
+    window, hop = _window_geometry(sample_rate, window_ms, hop_ms)
+    use_numpy = resolve_feature_engine(engine) == "numpy"
+    compute = _feature_compute(engine, feature_set, sample_rate, n_mels)
+    if frame_fps:
+        return _iter_frame_aligned_rows(blocks, sample_rate, window, frame_fps, compute, use_numpy)
+    return _iter_hop_rows(blocks, window, hop, compute, use_numpy)
+
+
+def _feature_row_count(
+    sample_count: int,
+    sample_rate: int,
+    window: int,
+    hop: int,
+    frame_fps: int | None,
+) -> int:
+    if sample_count <= 0:
+        return 0
+    if frame_fps:
+        return (sample_count * frame_fps + sample_rate - 1) // sample_rate
+    if sample_count < window:
+        return 1
+    return (sample_count - window) // hop + 1
+
+
+def _feature_row_start(
+    row: int,
+    sample_count: int,
+    sample_rate: int,
+    window: int,
+    hop: int,
+    frame_fps: int | None,
+) -> int:
+    if frame_fps:
+        return min(max(0, (row * sample_rate) // frame_fps - window // 2), max(0, sample_count - window))
+    return row * hop
+
+
+def _read_wav_samples(path: Path, info: WavInfo, first: int, end: int, use_numpy: bool):
+    with path.open("rb") as handle:
+        handle.seek(info.data_offset + first * info.block_align)
+        raw = handle.read((end - first) * info.block_align)
+    return _decode_wav_block(raw, info, use_numpy)
+
+
+def _read_resampled_samples(
+    path: Path,
+    info: WavInfo,
+    plan: ResamplePlan,
+    first: int,
+    end: int,
+    use_numpy: bool,
+):
+    # Read just the source span these outputs depend on; zero padding past either end
+    # of the clip reproduces what the streaming resampler sees.
+    span_lo, span_hi = _resample_span(plan, first, end)
+    read_lo = max(0, span_lo)
+    read_hi = max(read_lo, min(info.frame_count, span_hi))
+    samples = _zeros(read_lo - span_lo, use_numpy)
+    samples = _append_samples(samples, _read_wav_samples(path, info, read_lo, read_hi, use_numpy), use_numpy)
+    samples = _append_samples(samples, _zeros(span_hi - read_hi, use_numpy), use_numpy)
+    return _polyphase_outputs(samples, span_lo, plan, first, end, use_numpy)
+
+
+def _extract_shard_rows(
+    path: Path,
+    info: WavInfo,
+    window: int,
+    hop: int,
+    frame_fps: int | None,
+    engine: str,
+    analysis_rate: int | None,
+    feature_set: str,
+    n_mels: int,
+    row_range: tuple[int, int],
+) -> list[list[float]]:
+    row_lo, row_hi = row_range
+    use_numpy = resolve_feature_engine(engine) == "numpy"
+    plan = _analysis_plan(info, analysis_rate)
+    sample_rate = info.sample_rate if plan is None else analysis_rate
+    compute = _feature_compute(engine, feature_set, sample_rate, n_mels)
+    sample_count = info.frame_count if plan is None else plan.output_length(info.frame_count)
+
+    def start_of(row: int) -> int:
+        return _feature_row_start(row, sample_count, sample_rate, window, hop, frame_fps)
+
+    first = start_of(row_lo)
+    end = min(sample_count, start_of(row_hi - 1) + window)
+    if plan is None:
+        samples = _read_wav_samples(path, info, first, end, use_numpy)
+    else:
+        samples = _read_resampled_samples(path, info, plan, first, end, use_numpy)
+    if frame_fps:
+        starts: Sequence[int] = [start_of(row) - first for row in range(row_lo, row_hi)]
+    else:
+        starts = range(0, (row_hi - row_lo) * hop, hop)
+    return compute(samples, starts, window)
+
+
+def _analysis_plan(info: WavInfo, analysis_rate: int | None) -> ResamplePlan | None:
+    if not analysis_rate or analysis_rate == info.sample_rate:
+        return None
+    return resample_plan(info.sample_rate, analysis_rate)
+
+
+def iter_sharded_feature_rows(
+    path: Path,
+    info: WavInfo,
+    window_ms: float = 25.0,
+    hop_ms: float = 10.0,
+    engine: str = "auto",
+    frame_fps: int | None = None,
+    workers: int = 2,
+    analysis_rate: int | None = None,
+    feature_set: str = "basic",
+    n_mels: int = DEFAULT_N_MELS,
+) -> Iterator[list[list[float]]]:
+    plan = _analysis_plan(info, analysis_rate)
+    sample_rate = info.sample_rate if plan is None else analysis_rate
+    sample_count = info.frame_count if plan is None else plan.output_length(info.frame_count)
+    window, hop = _window_geometry(sample_rate, window_ms, hop_ms)
+    total_rows = _feature_row_count(sample_count, sample_rate, window, hop, frame_fps)
+    if total_rows == 0:
+        return
+    # Each shard reads its own sample range, overlapping its neighbour by the part of a
+    # window that straddles the boundary, so stitched rows match the serial pass exactly.
+    shard_rows = min(_SHARD_MAX_ROWS, max(_SHARD_MIN_ROWS, -(-total_rows // (workers * 4))))
+    row_ranges = [(lo, min(total_rows, lo + shard_rows)) for lo in range(0, total_rows, shard_rows)]
+    worker = partial(
+        _extract_shard_rows,
+        path,
+        info,
+        window,
+        hop,
+        frame_fps,
+        resolve_feature_engine(engine),
+        None if plan is None else analysis_rate,
+        resolve_feature_set(feature_set, engine),
+        n_mels,
+    )
+    with ProcessPoolExecutor(max_workers=min(workers, len(row_ranges))) as executor:
+        yield from executor.map(worker, row_ranges)
+
+
+def compute_window_features(
+    samples: list[float],
+    sample_rate: int,
+    window_ms: float = 25.0,
+    hop_ms: float = 10.0,
+    engine: str = "auto",
+    frame_fps: int | None = None,
+    feature_set: str = "basic",
+    n_mels: int = DEFAULT_N_MELS,
+) -> list[list[float]]:
+    matrix: list[list[float]] = []
+    for rows in iter_feature_rows(
+        [samples],
+        sample_rate,
+        window_ms=window_ms,
+        hop_ms=hop_ms,
+        engine=engine,
+        frame_fps=frame_fps,
+        feature_set=feature_set,
+        n_mels=n_mels,
+    ):
+        matrix.extend(rows)
+    return matrix
+
+
+def extract_audio_features(
+    input_audio: Path,
+    output_npy: Path,
+    window_ms: float = 25.0,
+    hop_ms: float = 10.0,
+    engine: str = "auto",
+    block_frames: int = WAV_BLOCK_FRAMES,
+    input_mode: str = "stream",
+    frame_fps: int | None = None,
+    workers: int = 1,
+    analysis_rate: int | None = None,
+    feature_set: str = "basic",
+    n_mels: int = DEFAULT_N_MELS,
+) -> int:
+    resolve_feature_set(feature_set, engine)
+    info = _read_native_wav_info(input_audio)
+    if info is None:
+        # ffmpeg resamples while decoding, so the pipe already runs at the analysis rate;
+        # a pipe cannot be split into shards, so this path is always serial.
+        sample_rate = analysis_rate or FFMPEG_ANALYSIS_RATE
+        blocks = iter_ffmpeg_mono_blocks(input_audio, sample_rate, block_frames=block_frames, engine=engine)
+        row_batches = iter_feature_rows(
+            blocks,
+            sample_rate,
+            window_ms=window_ms,
+            hop_ms=hop_ms,
+            engine=engine,
+            frame_fps=frame_fps,
+            feature_set=feature_set,
+            n_mels=n_mels,
+        )
+        return _write_feature_rows(output_npy, row_batches, feature_dim(feature_set, n_mels))
+
+    plan = _analysis_plan(info, analysis_rate)
+    if workers > 1:
+        row_batches = iter_sharded_feature_rows(
+            input_audio,
+            info,
+            window_ms=window_ms,
+            hop_ms=hop_ms,
+            engine=engine,
+            frame_fps=frame_fps,
+            workers=workers,
+            analysis_rate=analysis_rate,
+            feature_set=feature_set,
+            n_mels=n_mels,
+        )
+    else:
+        blocks = iter_audio_blocks(
+            input_audio,
+            block_frames=block_frames,
+            engine=engine,
+            input_mode=input_mode,
+            info=info,
+        )
+        if plan is not None:
+            blocks = iter_resampled_blocks(blocks, info.sample_rate, analysis_rate, engine=engine)
+        row_batches = iter_feature_rows(
+            blocks,
+            info.sample_rate if plan is None else analysis_rate,
+            window_ms=window_ms,
+            hop_ms=hop_ms,
+            engine=engine,
+            frame_fps=frame_fps,
+            feature_set=feature_set,
+            n_mels=n_mels,
+        )
+    return _write_feature_rows(output_npy, row_batches, feature_dim(feature_set, n_mels))
+
+
+def _read_native_wav_info(path: Path) -> WavInfo | None:
+    # WAV files the RIFF reader understands stay on the native path; anything else
+    # (MP3/AAC/OGG or compressed WAV codecs) is decoded through ffmpeg when available.
+    if is_wav_file(path):
+        try:
+            return read_wav_info(path)
+        except ValueError:
+            if not ffmpeg_available():
+                raise
+            return None
+    if not ffmpeg_available():
+        raise ValueError(f"Unsupported audio input without ffmpeg: {path}")
+    return None
+
+
+def _write_feature_rows(output_npy: Path, row_batches: Iterable[list[list[float]]], dim: int) -> int:
+    with NpyF32Writer(output_npy, row_shape=(dim,)) as writer:
+        for rows in row_batches:
+            writer.append(rows)
+        if writer.rows == 0:
+            writer.append([[0.0] * dim])
+        return writer.rows
+
+
+def detect_silent_segments(
+    rms_values: Iterable[float],
+    threshold: float = VAD_RMS_THRESHOLD,
+    min_rows: int = VAD_MIN_SILENT_ROWS,
+) -> list[list[int]]:
+    segments: list[list[int]] = []
+    start: int | None = None
+    count = 0
+    for index, rms in enumerate(rms_values):
+        count = index + 1
+        if rms < threshold:
+            if start is None:
+                start = index
+        elif start is not None:
+            if index - start >= min_rows:
+                segments.append([start, index])
+            start = None
+    if start is not None and count - start >= min_rows:
+        segments.append([start, count])
+    return segments
+
+
+def build_voice_activity(
+    audio_features: Path,
+    output_json: Path,
+    threshold: float = VAD_RMS_THRESHOLD,
+    min_silent_rows: int = VAD_MIN_SILENT_ROWS,
+) -> int:
+    with open_npy_f32_rows(audio_features) as rows:
+        row_count = len(rows)
+        segments = detect_silent_segments(
+            rows.iter_column(0),
+            threshold=threshold,
+            min_rows=min_silent_rows,
+        )
+    payload = {
+        "rows": row_count,
+        "rms_threshold": threshold,
+        "min_silent_rows": min_silent_rows,
+        # Half-open [start, end) ranges of audio_features.npy rows.
+        "silent_segments": segments,
+    }
+    output_json.write_text(json.dumps(payload, ensure_ascii=True), encoding="utf-8")
+    return len(segments)
+
+
+_IMAGE_HEAD_BYTES = 32
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01}
+
+
+def _jpeg_size(handle) -> tuple[int, int] | None:
+    # Walk marker segments with small reads, seeking over each payload.
+    handle.seek(2)
+    while True:
+        byte = handle.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = handle.read(1)
+        while marker == b"\xff":
+            marker = handle.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in _JPEG_STANDALONE_MARKERS or code == 0x00:
+            continue
+        if code in (0xD9, 0xDA):
+            return None
+        length_raw = handle.read(2)
+        if len(length_raw) < 2:
+            return None
+        length = int.from_bytes(length_raw, "big")
+        if length < 2:
+            return None
+        if code in _JPEG_SOF_MARKERS:
+            frame = handle.read(5)
+            if len(frame) < 5 or length < 7:
+                return None
+            return int.from_bytes(frame[3:5], "big"), int.from_bytes(frame[1:3], "big")
+        handle.seek(length - 2, os.SEEK_CUR)
+
+
+def _header_size(head: bytes) -> tuple[int, int] | None:
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+        return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    if head.startswith(b"BM") and len(head) >= 26:
+        dib_size = int.from_bytes(head[14:18], "little")
+        if dib_size == 12:
+            return int.from_bytes(head[18:20], "little"), int.from_bytes(head[20:22], "little")
+        width = int.from_bytes(head[18:22], "little", signed=True)
+        height = int.from_bytes(head[22:26], "little", signed=True)
+        # Negative height marks a top-down bitmap.
+        return abs(width), abs(height)
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP" and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+            return (
+                int.from_bytes(head[26:28], "little") & 0x3FFF,
+                int.from_bytes(head[28:30], "little") & 0x3FFF,
+            )
+        if chunk == b"VP8L" and head[20] == 0x2F:
+            bits = int.from_bytes(head[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+@lru_cache(maxsize=256)
+def _probe_image_size(path: str, mtime_ns: int, size: int) -> tuple[int, int] | None:
+    _ = (mtime_ns, size)
+    with open(path, "rb") as handle:
+        head = handle.read(_IMAGE_HEAD_BYTES)
+        if head.startswith(b"\xff\xd8"):
+            return _jpeg_size(handle)
+        return _header_size(head)
+
+
+def get_image_size(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    # Memoized per file version so repeated lookups of the same reference image cost one stat.
+    size = _probe_image_size(str(path), stat.st_mtime_ns, stat.st_size)
+    if size is None:
+        raise ValueError(f"Unsupported image format for size detection: {path}")
+    return size
 
 
 def build_mouth_landmarks(
     reference_image: Path,
     output_json: Path,
     frame_count: int = 12,
+    output_track: Path | None = None,
 ) -> int:
     width, height = get_image_size(reference_image)
     _ = (width, height)
@@ -157,5 +1115,205 @@ def build_mouth_landmarks(
         )
 
     output_json.write_text(json.dumps(landmarks, ensure_ascii=True, indent=2), encoding="utf-8")
+    # The JSON stays for compatibility; the [T, P, 2] float64 track is what the generator reads.
+    # float64 keeps the exact values the JSON holds, so both paths draw the same pixel rows.
+    # It is written after the JSON so its mtime marks it as current.
+    track_path = output_track if output_track is not None else landmark_track_path(output_json)
+    with NpyF32Writer(track_path, row_shape=(4, 2), descr="<f8") as writer:
+        writer.append([row["points"] for row in landmarks])
     return frame_count
 
+
+def collect_batch_clips(inputs: Iterable[Path]) -> list[tuple[str, Path]]:
+    """Expand files and directories (searched recursively for .wav) into (archive key, path) pairs."""
+    clips: list[tuple[str, Path]] = []
+    seen: set[str] = set()
+    for path in inputs:
+        if path.is_dir():
+            found = sorted(item for item in path.rglob("*") if item.is_file() and item.suffix.lower() == ".wav")
+            entries = [(item.relative_to(path).with_suffix("").as_posix(), item) for item in found]
+        else:
+            entries = [(path.stem, path)]
+        for key, clip in entries:
+            if key in seen:
+                raise ValueError(f"Duplicate clip name in batch: {key}")
+            seen.add(key)
+            clips.append((key, clip))
+    return clips
+
+
+def _extract_batch_clip(
+    scratch_dir: Path,
+    window_ms: float,
+    hop_ms: float,
+    engine: str,
+    frame_fps: int | None,
+    analysis_rate: int | None,
+    feature_set: str,
+    n_mels: int,
+    item: tuple[int, str, Path],
+) -> dict[str, object]:
+    index, key, path = item
+    output = scratch_dir / f"{index:08d}.npy"
+    started = time.perf_counter()
+    try:
+        info = _read_native_wav_info(path)
+        rows = extract_audio_features(
+            path,
+            output,
+            window_ms=window_ms,
+            hop_ms=hop_ms,
+            engine=engine,
+            frame_fps=frame_fps,
+            analysis_rate=analysis_rate,
+            feature_set=feature_set,
+            n_mels=n_mels,
+        )
+    except (OSError, RuntimeError, ValueError) as exc:
+        output.unlink(missing_ok=True)
+        return {"key": key, "path": str(path), "error": str(exc)}
+    if info is not None:
+        audio_sec = info.frame_count / info.sample_rate
+    else:
+        audio_sec = rows / frame_fps if frame_fps else rows * hop_ms / 1000.0
+    return {
+        "key": key,
+        "path": str(path),
+        "npy": str(output),
+        "rows": rows,
+        "audio_sec": audio_sec,
+        "elapsed_sec": time.perf_counter() - started,
+    }
+
+
+def iter_batch_audio_features(
+    clips: Sequence[tuple[str, Path]],
+    output_archive: Path,
+    workers: int = 2,
+    window_ms: float = 25.0,
+    hop_ms: float = 10.0,
+    engine: str = "auto",
+    frame_fps: int | None = None,
+    analysis_rate: int | None = None,
+    feature_set: str = "basic",
+    n_mels: int = DEFAULT_N_MELS,
+) -> Iterator[dict[str, object]]:
+    """Extract features for many clips on a process pool into one NPZ archive (one member per clip).
+
+    Results are yielded in input order as each member is stored; the archive only replaces
+    ``output_archive`` once the iterator is exhausted.
+    """
+    resolve_feature_set(feature_set, engine)
+    output_archive.parent.mkdir(parents=True, exist_ok=True)
+    with ExitStack() as stack:
+        scratch_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(dir=output_archive.parent)))
+        worker = partial(
+            _extract_batch_clip,
+            scratch_dir,
+            window_ms,
+            hop_ms,
+            engine,
+            frame_fps,
+            analysis_rate,
+            feature_set,
+            n_mels,
+        )
+        items = [(index, key, path) for index, (key, path) in enumerate(clips)]
+        if workers > 1 and len(items) > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=min(workers, len(items))))
+            results = executor.map(worker, items)
+        else:
+            results = map(worker, items)
+        partial_archive = scratch_dir / "archive.npz"
+        # Members are already-encoded NPY files, so they are stored rather than deflated.
+        with zipfile.ZipFile(partial_archive, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for result in results:
+                if "npy" in result:
+                    member = Path(str(result.pop("npy")))
+                    archive.write(member, arcname=f"{result['key']}.npy")
+                    member.unlink()
+                yield result
+        os.replace(partial_archive, output_archive)
+
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Extract audio features for many clips into one NPZ archive.")
+    parser.add_argument("inputs", nargs="+", help="WAV files or directories searched recursively for .wav")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--window-ms", type=float, default=25.0)
+    parser.add_argument("--hop-ms", type=float, default=10.0)
+    parser.add_argument("--feature-engine", choices=list(FEATURE_ENGINES), default="auto")
+    parser.add_argument("--frame-fps", type=int, default=None)
+    parser.add_argument("--analysis-rate", type=int, default=None)
+    parser.add_argument("--feature-set", choices=list(FEATURE_SETS), default="basic")
+    parser.add_argument("--n-mels", type=int, default=DEFAULT_N_MELS)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_batch_parser().parse_args(argv)
+    inputs = [Path(value) for value in args.inputs]
+    for path in inputs:
+        if not path.exists():
+            print(f"ERROR: input_audio_not_found path={path}")
+            return 1
+    if args.workers <= 0:
+        print(f"ERROR: invalid_workers value={args.workers}")
+        return 1
+    if args.frame_fps is not None and args.frame_fps <= 0:
+        print(f"ERROR: invalid_frame_fps value={args.frame_fps}")
+        return 1
+    if args.feature_set == "spectral" and resolve_feature_engine(args.feature_engine) != "numpy":
+        print("ERROR: feature_set_unavailable feature_set=spectral reason=numpy_required")
+        return 1
+    try:
+        clips = collect_batch_clips(inputs)
+    except ValueError as exc:
+        print(f"ERROR: invalid_batch_inputs detail={exc}")
+        return 1
+    if not clips:
+        print("ERROR: no_batch_inputs")
+        return 1
+
+    started = time.perf_counter()
+    failed = 0
+    rows = 0
+    audio_sec = 0.0
+    output = Path(args.output)
+    for result in iter_batch_audio_features(
+        clips,
+        output,
+        workers=args.workers,
+        window_ms=args.window_ms,
+        hop_ms=args.hop_ms,
+        engine=args.feature_engine,
+        frame_fps=args.frame_fps,
+        analysis_rate=args.analysis_rate,
+        feature_set=args.feature_set,
+        n_mels=args.n_mels,
+    ):
+        if "error" in result:
+            failed += 1
+            print(f"ERROR: batch_clip_failed key={result['key']} path={result['path']} detail={result['error']}")
+            continue
+        rows += int(result["rows"])
+        audio_sec += float(result["audio_sec"])
+        elapsed = float(result["elapsed_sec"])
+        print(
+            f"METRIC: batch_clip key={result['key']} rows={result['rows']} "
+            f"audio_sec={float(result['audio_sec']):.3f} elapsed_sec={elapsed:.3f} "
+            f"realtime_x={float(result['audio_sec']) / max(elapsed, 1e-9):.1f}"
+        )
+    wall_sec = time.perf_counter() - started
+    print(
+        f"METRIC: batch_preprocess_completed output={output} clips={len(clips) - failed} failed={failed} "
+        f"rows={rows} audio_sec={audio_sec:.3f} wall_sec={wall_sec:.3f} "
+        f"clips_per_sec={(len(clips) - failed) / max(wall_sec, 1e-9):.2f} "
+        f"realtime_x={audio_sec / max(wall_sec, 1e-9):.1f}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,6 +9,8 @@ if __package__ in (None, ""):
     sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from pipeline.config import GeneratorConfig, PostprocessConfig, PreprocessConfig, ScaffoldConfig
+from pipeline.npy_io import QUANTIZATION_SCHEMES
+from pipeline.preprocess import AUDIO_INPUT_MODES, FEATURE_ENGINES, FEATURE_SETS, numpy_available
 from pipeline.scaffold import run_scaffold_pipeline
 
 
@@ -19,6 +21,18 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--workspace", required=True)
     parser.add_argument("--window-ms", type=float, default=25.0)
     parser.add_argument("--hop-ms", type=float, default=10.0)
+    parser.add_argument("--feature-engine", choices=list(FEATURE_ENGINES), default="auto")
+    parser.add_argument("--audio-input-mode", choices=list(AUDIO_INPUT_MODES), default="stream")
+    parser.add_argument("--feature-sampling", choices=["hop", "frame"], default="hop")
+    parser.add_argument("--preprocess-workers", type=int, default=1)
+    parser.add_argument("--analysis-rate", type=int, default=None)
+    parser.add_argument("--feature-set", choices=list(FEATURE_SETS), default="basic")
+    parser.add_argument("--n-mels", type=int, default=40)
+    parser.add_argument("--feature-quantization", choices=list(QUANTIZATION_SCHEMES), default="none")
+    parser.add_argument("--feature-cache-dir", default=None)
+    parser.add_argument("--feature-cache-max-mb", type=int, default=1024)
+    parser.add_argument("--vad-rms-threshold", type=float, default=0.01)
+    parser.add_argument("--vad-min-silent-rows", type=int, default=3)
     parser.add_argument("--frame-count", type=int, default=12)
     parser.add_argument("--fps", type=int, default=25)
     parser.add_argument("--disable-watermark", action="store_true")
@@ -32,6 +46,7 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--vit-image-size", type=int, default=224)
     parser.add_argument("--vit-reference-dir", default=None)
     parser.add_argument("--vit-reference-limit", type=int, default=8)
+    parser.add_argument("--vit-decode-workers", type=int, default=4)
     parser.add_argument("--no-vit-fallback-mock", action="store_true")
     parser.add_argument("--vit-model-name", default="google/vit-base-patch16-224")
     parser.add_argument("--vit-use-pretrained", action="store_true")
@@ -44,6 +59,10 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--vit-overfit-guard-strength", type=float, default=0.0)
     parser.add_argument("--temporal-spatial-loss-weight", type=float, default=0.0)
     parser.add_argument("--temporal-smooth-factor", type=float, default=0.35)
+    parser.add_argument("--reuse-silent-frames", action="store_true")
+    parser.add_argument("--image-cache-max-mb", type=int, default=64)
+    parser.add_argument("--image-sidecar-dir", default=None)
+    parser.add_argument("--image-sidecar-max-mb", type=int, default=1024)
     return parser
 
 
@@ -75,6 +94,36 @@ def main() -> int:
             f"window_ms={args.window_ms} hop_ms={args.hop_ms}"
         )
         return 1
+    if args.preprocess_workers <= 0:
+        print(f"ERROR: invalid_preprocess_workers value={args.preprocess_workers}")
+        return 1
+    if args.analysis_rate is not None and args.analysis_rate <= 0:
+        print(f"ERROR: invalid_analysis_rate value={args.analysis_rate}")
+        return 1
+    if args.feature_cache_max_mb <= 0:
+        print(f"ERROR: invalid_feature_cache_max_mb value={args.feature_cache_max_mb}")
+        return 1
+    if args.image_cache_max_mb < 0:
+        print(f"ERROR: invalid_image_cache_max_mb value={args.image_cache_max_mb}")
+        return 1
+    if args.image_sidecar_max_mb <= 0:
+        print(f"ERROR: invalid_image_sidecar_max_mb value={args.image_sidecar_max_mb}")
+        return 1
+    if args.vad_rms_threshold < 0.0:
+        print(f"ERROR: invalid_vad_rms_threshold value={args.vad_rms_threshold}")
+        return 1
+    if args.vad_min_silent_rows <= 0:
+        print(f"ERROR: invalid_vad_min_silent_rows value={args.vad_min_silent_rows}")
+        return 1
+    if args.feature_engine == "numpy" and not numpy_available():
+        print("ERROR: feature_engine_unavailable engine=numpy")
+        return 1
+    if args.n_mels <= 0:
+        print(f"ERROR: invalid_n_mels value={args.n_mels}")
+        return 1
+    if args.feature_set == "spectral" and (args.feature_engine == "python" or not numpy_available()):
+        print(f"ERROR: feature_set_unavailable feature_set=spectral engine={args.feature_engine}")
+        return 1
     if args.vit_patch_size <= 0 or args.vit_image_size <= 0:
         print(
             "ERROR: invalid_vit_size "
@@ -84,6 +133,9 @@ def main() -> int:
     if args.vit_reference_limit <= 0:
         print(f"ERROR: invalid_vit_reference_limit value={args.vit_reference_limit}")
         return 1
+    if args.vit_decode_workers <= 0:
+        print(f"ERROR: invalid_vit_decode_workers value={args.vit_decode_workers}")
+        return 1
     if args.vit_3d_conditioning_weight < 0.0 or args.vit_3d_conditioning_weight > 1.0:
         print(
             "ERROR: invalid_vit_3d_conditioning_weight "
@@ -133,12 +185,25 @@ def main() -> int:
             window_ms=args.window_ms,
             hop_ms=args.hop_ms,
             landmark_frames=args.frame_count,
+            feature_engine=args.feature_engine,
+            audio_input_mode=args.audio_input_mode,
+            feature_fps=args.fps if args.feature_sampling == "frame" else None,
+            workers=args.preprocess_workers,
+            analysis_rate=args.analysis_rate,
+            feature_set=args.feature_set,
+            n_mels=args.n_mels,
+            feature_quantization=args.feature_quantization,
+            feature_cache_dir=args.feature_cache_dir,
+            feature_cache_max_bytes=args.feature_cache_max_mb * 1024 * 1024,
+            vad_rms_threshold=args.vad_rms_threshold,
+            vad_min_silent_rows=args.vad_min_silent_rows,
         ),
         generator=GeneratorConfig(
             frame_count=args.frame_count,
             backend=args.generator_backend,
             vit_reference_dir=args.vit_reference_dir,
             vit_reference_limit=args.vit_reference_limit,
+            vit_decode_workers=args.vit_decode_workers,
             vit_patch_size=args.vit_patch_size,
             vit_image_size=args.vit_image_size,
             vit_fallback_mock=not args.no_vit_fallback_mock,
@@ -153,6 +218,10 @@ def main() -> int:
             vit_overfit_guard_strength=args.vit_overfit_guard_strength,
             temporal_spatial_loss_weight=args.temporal_spatial_loss_weight,
             temporal_smooth_factor=args.temporal_smooth_factor,
+            reuse_silent_frames=args.reuse_silent_frames,
+            image_cache_max_bytes=args.image_cache_max_mb * 1024 * 1024,
+            image_sidecar_dir=args.image_sidecar_dir,
+            image_sidecar_max_bytes=args.image_sidecar_max_mb * 1024 * 1024,
         ),
         postprocess=PostprocessConfig(
             fps=args.fps,
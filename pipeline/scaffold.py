@@ -12,10 +12,13 @@ from pipeline.contracts import (
     Preprocessor,
 )
 from pipeline.engine import PipelineRunner
+from pipeline.feature_cache import FeatureCache, feature_cache_key, hash_file
 from pipeline.generator import generate_frames_with_backend
+from pipeline.image_io import DECODERS, IMAGE_CACHE, configure_rgb_sidecar_cache, list_reference_images
 from pipeline.interfaces import PipelinePaths
+from pipeline.npy_io import quantization_sidecar_path, quantize_npy_f32
 from pipeline.postprocess import finalize_output_video
-from pipeline.preprocess import build_mouth_landmarks, extract_audio_features
+from pipeline.preprocess import build_mouth_landmarks, build_voice_activity, extract_audio_features
 
 
 def _list_reference_images(reference_dir: str | None, limit: int) -> list[Path]:
@@ -24,38 +27,106 @@ def _list_reference_images(reference_dir: str | None, limit: int) -> list[Path]:
     root = Path(reference_dir)
     if not root.is_dir():
         return []
-    allow = {".png", ".jpg", ".jpeg", ".bmp", ".webp"}
-    images = [p for p in sorted(root.iterdir()) if p.is_file() and p.suffix.lower() in allow]
-    if limit > 0:
-        images = images[:limit]
-    return images
+    return list_reference_images(root, limit)
 
 
 class ScaffoldPreprocessor(Preprocessor):
     def __init__(self, config: PreprocessConfig) -> None:
         self.config = config
+        self._feature_cache_hit: bool | None = None
+        self._feature_cache_key: str | None = None
+        self._feature_cache_evicted = 0
+        self._vad_silent_segments: int | None = None
+        self._audio_features_bytes: int | None = None
 
     def describe(self) -> dict:
         return {
             "window_ms": self.config.window_ms,
             "hop_ms": self.config.hop_ms,
             "landmark_frames": self.config.landmark_frames,
+            "feature_engine": self.config.feature_engine,
+            "audio_input_mode": self.config.audio_input_mode,
+            "feature_fps": self.config.feature_fps,
+            "workers": self.config.workers,
+            "analysis_rate": self.config.analysis_rate,
+            "feature_set": self.config.feature_set,
+            "n_mels": self.config.n_mels,
+            "feature_quantization": self.config.feature_quantization,
+            "audio_features_bytes": self._audio_features_bytes,
+            "feature_cache_dir": self.config.feature_cache_dir,
+            "feature_cache_max_bytes": self.config.feature_cache_max_bytes,
+            "feature_cache_hit": self._feature_cache_hit,
+            "feature_cache_key": self._feature_cache_key,
+            "feature_cache_evicted": self._feature_cache_evicted,
+            "vad_rms_threshold": self.config.vad_rms_threshold,
+            "vad_min_silent_rows": self.config.vad_min_silent_rows,
+            "vad_silent_segments": self._vad_silent_segments,
         }
 
-    def run(self, payload: PipelineInput) -> IntermediateArtifacts:
-        paths = PipelinePaths(payload.workspace)
-        payload.workspace.mkdir(parents=True, exist_ok=True)
+    def _feature_cache_params(self) -> dict[str, object]:
+        return {
+            "window_ms": self.config.window_ms,
+            "hop_ms": self.config.hop_ms,
+            "feature_fps": self.config.feature_fps,
+            "analysis_rate": self.config.analysis_rate,
+            "feature_set": self.config.feature_set,
+            "n_mels": self.config.n_mels if self.config.feature_set == "spectral" else None,
+        }
+
+    def _extract_audio_features(self, payload: PipelineInput, output_npy: Path) -> None:
+        # Never write through a hard link that may point into the feature cache.
+        output_npy.unlink(missing_ok=True)
+        quantization_sidecar_path(output_npy).unlink(missing_ok=True)
+        self._write_float_features(payload, output_npy)
+        # The cache keeps float32 matrices; quantization is a cheap pass over the result.
+        if self.config.feature_quantization != "none":
+            quantize_npy_f32(output_npy, output_npy, self.config.feature_quantization)
+        self._audio_features_bytes = output_npy.stat().st_size
+
+    def _write_float_features(self, payload: PipelineInput, output_npy: Path) -> None:
+        cache = None
+        if self.config.feature_cache_dir:
+            cache = FeatureCache(Path(self.config.feature_cache_dir), self.config.feature_cache_max_bytes)
+            self._feature_cache_key = feature_cache_key(
+                hash_file(payload.input_audio),
+                self._feature_cache_params(),
+            )
+            self._feature_cache_hit = cache.fetch(self._feature_cache_key, output_npy)
+            if self._feature_cache_hit:
+                return
 
         extract_audio_features(
             payload.input_audio,
-            paths.audio_features,
+            output_npy,
             window_ms=self.config.window_ms,
             hop_ms=self.config.hop_ms,
+            engine=self.config.feature_engine,
+            input_mode=self.config.audio_input_mode,
+            frame_fps=self.config.feature_fps,
+            workers=self.config.workers,
+            analysis_rate=self.config.analysis_rate,
+            feature_set=self.config.feature_set,
+            n_mels=self.config.n_mels,
+        )
+        if cache is not None and self._feature_cache_key is not None:
+            self._feature_cache_evicted = cache.store(self._feature_cache_key, output_npy)
+
+    def run(self, payload: PipelineInput) -> IntermediateArtifacts:
+        paths = PipelinePaths(payload.workspace)
+        payload.workspace.mkdir(parents=True, exist_ok=True)
+
+        self._extract_audio_features(payload, paths.audio_features)
+        self._vad_silent_segments = build_voice_activity(
+            paths.audio_features,
+            paths.voice_activity,
+            threshold=self.config.vad_rms_threshold,
+            min_silent_rows=self.config.vad_min_silent_rows,
         )
         build_mouth_landmarks(
             payload.reference_image,
             paths.mouth_landmarks,
             frame_count=self.config.landmark_frames,
+            output_track=paths.mouth_landmark_track,
         )
 
         return IntermediateArtifacts(
@@ -70,6 +141,12 @@ class ScaffoldGenerator(Generator):
         self.config = config
         self._backend_used = "not-run"
         self._reference_image_count = 1
+        self._reference_decode: list[dict[str, object]] = []
+        self._frames_reused = 0
+        self._render_time_saved_sec = 0.0
+        self._image_cache_delta = {"hits": 0, "misses": 0, "evictions": 0}
+        self._image_sidecar_delta = {"hits": 0, "stores": 0}
+        self._image_decoders: dict[str, dict[str, object]] = {}
 
     def describe(self) -> dict:
         return {
@@ -79,6 +156,8 @@ class ScaffoldGenerator(Generator):
             "vit_reference_dir": self.config.vit_reference_dir,
             "vit_reference_limit": self.config.vit_reference_limit,
             "vit_reference_count": self._reference_image_count,
+            "vit_decode_workers": self.config.vit_decode_workers,
+            "vit_reference_decode": self._reference_decode,
             "vit_patch_size": self.config.vit_patch_size,
             "vit_image_size": self.config.vit_image_size,
             "vit_model_name": self.config.vit_model_name,
@@ -92,6 +171,17 @@ class ScaffoldGenerator(Generator):
             "vit_overfit_guard_strength": self.config.vit_overfit_guard_strength,
             "temporal_spatial_loss_weight": self.config.temporal_spatial_loss_weight,
             "temporal_smooth_factor": self.config.temporal_smooth_factor,
+            "reuse_silent_frames": self.config.reuse_silent_frames,
+            "frames_reused": self._frames_reused,
+            "render_time_saved_sec": round(self._render_time_saved_sec, 6),
+            "image_cache_max_bytes": self.config.image_cache_max_bytes,
+            "image_cache_hits": self._image_cache_delta["hits"],
+            "image_cache_misses": self._image_cache_delta["misses"],
+            "image_cache_evictions": self._image_cache_delta["evictions"],
+            "image_sidecar_dir": self.config.image_sidecar_dir,
+            "image_sidecar_hits": self._image_sidecar_delta["hits"],
+            "image_sidecar_stores": self._image_sidecar_delta["stores"],
+            "image_decoders": self._image_decoders,
         }
 
     def run(
@@ -103,6 +193,15 @@ class ScaffoldGenerator(Generator):
             reference_dir=self.config.vit_reference_dir,
             limit=self.config.vit_reference_limit,
         )
+        # The decoded-image cache is process-wide; report only this run's share of its counters.
+        IMAGE_CACHE.resize(self.config.image_cache_max_bytes)
+        sidecar = configure_rgb_sidecar_cache(
+            Path(self.config.image_sidecar_dir) if self.config.image_sidecar_dir else None,
+            self.config.image_sidecar_max_bytes,
+        )
+        before = IMAGE_CACHE.stats()
+        sidecar_before = sidecar.stats() if sidecar is not None else None
+        decoders_before = DECODERS.stats()
         result = generate_frames_with_backend(
             reference_image=payload.reference_image,
             audio_features=artifacts.audio_features,
@@ -111,6 +210,7 @@ class ScaffoldGenerator(Generator):
             frame_count=self.config.frame_count,
             backend=self.config.backend,
             vit_reference_images=extra_images,
+            vit_decode_workers=self.config.vit_decode_workers,
             vit_patch_size=self.config.vit_patch_size,
             vit_image_size=self.config.vit_image_size,
             vit_fallback_mock=self.config.vit_fallback_mock,
@@ -125,8 +225,30 @@ class ScaffoldGenerator(Generator):
             vit_overfit_guard_strength=self.config.vit_overfit_guard_strength,
             temporal_spatial_loss_weight=self.config.temporal_spatial_loss_weight,
             temporal_smooth_factor=self.config.temporal_smooth_factor,
+            voice_activity=PipelinePaths(payload.workspace).voice_activity,
+            reuse_silent_frames=self.config.reuse_silent_frames,
         )
+        after = IMAGE_CACHE.stats()
+        self._image_cache_delta = {name: after[name] - before[name] for name in self._image_cache_delta}
+        # Probe results and disabled formats are process state; calls and latency are this run's.
+        self._image_decoders = {
+            name: {
+                **stats,
+                "calls": stats["calls"] - decoders_before[name]["calls"],
+                "failures": stats["failures"] - decoders_before[name]["failures"],
+                "decode_sec": round(stats["decode_sec"] - decoders_before[name]["decode_sec"], 6),
+            }
+            for name, stats in DECODERS.stats().items()
+        }
+        if sidecar is not None:
+            sidecar_after = sidecar.stats()
+            self._image_sidecar_delta = {
+                name: sidecar_after[name] - sidecar_before[name] for name in self._image_sidecar_delta
+            }
         self._backend_used = str(result.get("backend_used", "unknown"))
+        self._frames_reused = int(result.get("frames_reused", 0))
+        self._render_time_saved_sec = float(result.get("render_time_saved_sec", 0.0))
+        self._reference_decode = list(result.get("vit_reference_decode", []))
         details = result.get("vit_details")
         if isinstance(details, dict):
             count = details.get("reference_count")
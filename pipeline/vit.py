@@ -2,10 +2,10 @@ from __future__ import annotations
 
 import hashlib
 import math
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
-from pipeline.image_io import load_rgb_image
+from pipeline.image_io import load_rgb_images
 
 
 @dataclass(frozen=True)
@@ -21,6 +21,8 @@ class VitResult:
     conditioning: VitConditioning
     backend_used: str
     details: dict[str, float | str]
+    # Per reference image: {"path", "source", "decode_sec"} from load_rgb_images.
+    reference_decode: list[dict[str, object]] = field(default_factory=list)
 
 
 def _clamp(value: float, low: float, high: float) -> float:
@@ -110,13 +112,12 @@ def _apply_overfit_guard(conditioning: VitConditioning, guard_strength: float) -
 
 
 def _mock_single_conditioning(
-    image_path: Path,
+    rgb: bytes,
     width: int,
     height: int,
     patch_size: int,
 ) -> tuple[VitConditioning, dict[str, float]]:
     patch_size = max(1, patch_size)
-    rgb = load_rgb_image(image_path, width=width, height=height)
     unit = _rgb_to_unit_values(rgb)
     if not unit:
         unit = [0.0]
@@ -158,13 +159,15 @@ def compute_mock_vit_conditioning(
     height: int,
     patch_size: int,
     reference_images: list[Path] | None = None,
+    decode_workers: int = 1,
 ) -> VitResult:
     images = _collect_reference_images(reference_image, reference_images)
     rows: list[VitConditioning] = []
     meta_rows: list[dict[str, float]] = []
-    for image_path in images:
+    timings: list[dict[str, object]] = []
+    for rgb in load_rgb_images(images, width=width, height=height, workers=decode_workers, timings=timings):
         cond, meta = _mock_single_conditioning(
-            image_path=image_path,
+            rgb=rgb,
             width=width,
             height=height,
             patch_size=patch_size,
@@ -184,6 +187,7 @@ def compute_mock_vit_conditioning(
             "spread": spread,
             "reference_count": float(len(images)),
         },
+        reference_decode=timings,
     )
 
 
@@ -200,6 +204,7 @@ def compute_hf_vit_conditioning(
     use_pretrained: bool,
     device: str,
     reference_images: list[Path] | None = None,
+    decode_workers: int = 1,
 ) -> VitResult:
     try:
         import torch
@@ -233,8 +238,8 @@ def compute_hf_vit_conditioning(
 
     images = _collect_reference_images(reference_image, reference_images)
     tensors: list[list[float]] = []
-    for image_path in images:
-        rgb = load_rgb_image(image_path, width=image_size, height=image_size)
+    timings: list[dict[str, object]] = []
+    for rgb in load_rgb_images(images, width=image_size, height=image_size, workers=decode_workers, timings=timings):
         tensors.append(_build_tensor_from_rgb(rgb))
     pixel_values = torch.tensor(tensors, dtype=torch.float32).reshape(len(tensors), 3, image_size, image_size)
 
@@ -268,6 +273,7 @@ def compute_hf_vit_conditioning(
             "device": run_device,
             "reference_count": float(len(images)),
         },
+        reference_decode=timings,
     )
 
 
@@ -283,6 +289,7 @@ def resolve_vit_conditioning(
     use_pretrained: bool,
     device: str,
     reference_images: list[Path] | None = None,
+    decode_workers: int = 1,
     spatial_params: dict[str, float] | None = None,
     spatial_weight: float = 0.0,
     enable_reference_augmentation: bool = False,
@@ -296,6 +303,7 @@ def resolve_vit_conditioning(
                 conditioning=base.conditioning,
                 backend_used=base.backend_used,
                 details={**base.details, "spatial_3d_applied": "false"},
+                reference_decode=base.reference_decode,
             )
 
         weight = _clamp(spatial_weight, 0.0, 1.0)
@@ -321,6 +329,7 @@ def resolve_vit_conditioning(
                 "spatial_3d_pitch": pitch,
                 "spatial_3d_depth": depth,
             },
+            reference_decode=base.reference_decode,
         )
 
     def with_phase4(base: VitResult) -> VitResult:
@@ -352,6 +361,7 @@ def resolve_vit_conditioning(
             conditioning=cond,
             backend_used=base.backend_used,
             details=details,
+            reference_decode=base.reference_decode,
         )
 
     if backend == "heuristic":
@@ -374,6 +384,7 @@ def resolve_vit_conditioning(
                     height=height,
                     patch_size=patch_size,
                     reference_images=reference_images,
+                    decode_workers=decode_workers,
                 )
             )
         )
@@ -390,6 +401,7 @@ def resolve_vit_conditioning(
                         use_pretrained=use_pretrained,
                         device=device,
                         reference_images=reference_images,
+                        decode_workers=decode_workers,
                     )
                 )
             )
@@ -402,6 +414,7 @@ def resolve_vit_conditioning(
                 height=height,
                 patch_size=patch_size,
                 reference_images=reference_images,
+                decode_workers=decode_workers,
             )
             return with_phase4(
                 with_spatial(
@@ -409,6 +422,7 @@ def resolve_vit_conditioning(
                         conditioning=mock.conditioning,
                         backend_used="vit-mock-fallback",
                         details={"reason": str(exc), **mock.details},
+                        reference_decode=mock.reference_decode,
                     )
                 )
             )
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from pipeline.feature_cache import FeatureCache, feature_cache_key, hash_file
+
+
+class FeatureCacheTest(unittest.TestCase):
+    def test_feature_cache_key_depends_on_params(self) -> None:
+        base = feature_cache_key("abc", {"window_ms": 25.0, "hop_ms": 10.0})
+        self.assertEqual(base, feature_cache_key("abc", {"hop_ms": 10.0, "window_ms": 25.0}))
+        self.assertNotEqual(base, feature_cache_key("abc", {"window_ms": 20.0, "hop_ms": 10.0}))
+        self.assertNotEqual(base, feature_cache_key("abd", {"window_ms": 25.0, "hop_ms": 10.0}))
+
+    def test_store_then_fetch_round_trip(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            source = root / "features.npy"
+            source.write_bytes(b"\x93NUMPY-features")
+            cache = FeatureCache(root / "cache")
+            key = feature_cache_key(hash_file(source), {"window_ms": 25.0})
+
+            self.assertFalse(cache.fetch(key, root / "miss.npy"))
+            cache.store(key, source)
+            destination = root / "workspace" / "audio_features.npy"
+            self.assertTrue(cache.fetch(key, destination))
+            self.assertEqual(destination.read_bytes(), source.read_bytes())
+
+            # Rewriting the workspace copy after unlinking must not touch the cache entry.
+            destination.unlink()
+            destination.write_bytes(b"other")
+            self.assertEqual(cache.entry_path(key).read_bytes(), source.read_bytes())
+
+    def test_store_evicts_least_recently_used(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            cache = FeatureCache(root / "cache", max_bytes=250)
+            payload = root / "payload.npy"
+            payload.write_bytes(b"x" * 100)
+
+            cache.store("aa" + "0" * 62, payload)
+            cache.store("bb" + "0" * 62, payload)
+            os.utime(cache.entry_path("aa" + "0" * 62), ns=(1, 1))
+            os.utime(cache.entry_path("bb" + "0" * 62), ns=(2, 2))
+            evicted = cache.store("cc" + "0" * 62, payload)
+
+            self.assertEqual(evicted, 1)
+            self.assertFalse(cache.entry_path("aa" + "0" * 62).exists())
+            self.assertTrue(cache.entry_path("bb" + "0" * 62).exists())
+            self.assertTrue(cache.entry_path("cc" + "0" * 62).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import json
 import math
+import os
 import struct
 import tempfile
 import unittest
 import wave
+import zlib
 from pathlib import Path
 
-from pipeline.generator import generate_frames, generate_frames_with_backend
-from pipeline.preprocess import build_mouth_landmarks, extract_audio_features
+from pipeline.generator import generate_frames, generate_frames_with_backend, load_mouth_landmark_track
+from pipeline.npy_io import NpyF32Writer, write_npy_f32_matrix
+from pipeline.preprocess import build_mouth_landmarks, build_voice_activity, extract_audio_features
 
 TINY_PNG = (
     b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01"
@@ -29,6 +32,10 @@ def read_png_size(path: Path) -> tuple[int, int]:
     return width, height
 
 
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
 class GeneratorTest(unittest.TestCase):
     def write_sine_wav(self, path: Path, seconds: float = 0.25, sample_rate: int = 16000) -> None:
         frames = int(seconds * sample_rate)
@@ -279,6 +286,134 @@ class GeneratorTest(unittest.TestCase):
             self.assertEqual(result["vit_augmentation_copies"], 3)
             self.assertEqual(result["vit_augmentation_strength"], 0.4)
 
+    def test_landmark_track_prefers_sidecar_unless_json_is_newer(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            reference_image = root / "face.png"
+            mouth_landmarks = root / "mouth_landmarks.json"
+            reference_image.write_bytes(TINY_PNG)
+            build_mouth_landmarks(reference_image, mouth_landmarks, frame_count=5)
+
+            track = load_mouth_landmark_track(mouth_landmarks)
+            self.assertEqual(len(track), 5)
+            self.assertEqual(track.point_count, 4)
+            self.assertAlmostEqual(track.xs[track.base(2) + 3], 0.60, places=6)
+
+            mouth_landmarks.write_text(
+                json.dumps([{"frame_index": 0, "points": [[0.1, 0.2]]}], ensure_ascii=True),
+                encoding="utf-8",
+            )
+            stat = (root / "mouth_landmarks.npy").stat()
+            os.utime(mouth_landmarks, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            stale = load_mouth_landmark_track(mouth_landmarks)
+            self.assertEqual(len(stale), 1)
+            self.assertFalse(stale.is_valid(0))
+
+            # A float32 sidecar from an older workspace is ignored even when it is newer.
+            with NpyF32Writer(root / "mouth_landmarks.npy", row_shape=(4, 2)) as writer:
+                writer.append([[[0.4, 0.58], [0.46, 0.63], [0.54, 0.63], [0.6, 0.58]]] * 3)
+            self.assertEqual(len(load_mouth_landmark_track(mouth_landmarks)), 1)
+
+    def test_sidecar_track_matches_json_values_over_a_long_track(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            reference_image = root / "face.png"
+            mouth_landmarks = root / "mouth_landmarks.json"
+            reference_image.write_bytes(TINY_PNG)
+            # Long enough that float32 rounding would move int(mouth_cy * height), e.g. frame 16248 at 256 rows.
+            build_mouth_landmarks(reference_image, mouth_landmarks, frame_count=20000)
+
+            sidecar = load_mouth_landmark_track(mouth_landmarks)
+            (root / "mouth_landmarks.npy").unlink()
+            from_json = load_mouth_landmark_track(mouth_landmarks)
+            self.assertEqual(len(sidecar), 20000)
+            self.assertEqual(sidecar.xs, from_json.xs)
+            self.assertEqual(sidecar.ys, from_json.ys)
+
+    def test_sidecar_track_renders_same_frames_as_json(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            reference_image = root / "face.png"
+            input_audio = root / "input.wav"
+            audio_features = root / "audio_features.npy"
+            mouth_landmarks = root / "mouth_landmarks.json"
+            # 100 rows puts the 0.64 landmark row exactly on a pixel boundary.
+            scanlines = b"".join(b"\x00" + bytes(range(100)) * 3 for _ in range(100))
+            reference_image.write_bytes(
+                b"\x89PNG\r\n\x1a\n"
+                + png_chunk(b"IHDR", struct.pack(">IIBBBBB", 100, 100, 8, 2, 0, 0, 0))
+                + png_chunk(b"IDAT", zlib.compress(scanlines))
+                + png_chunk(b"IEND", b"")
+            )
+            self.write_sine_wav(input_audio)
+            extract_audio_features(input_audio, audio_features)
+            build_mouth_landmarks(reference_image, mouth_landmarks, frame_count=12)
+
+            rendered = {}
+            for source in ("sidecar", "json"):
+                if source == "json":
+                    (root / "mouth_landmarks.npy").unlink()
+                track = load_mouth_landmark_track(mouth_landmarks)
+                expected = json.loads(mouth_landmarks.read_text(encoding="utf-8"))
+                self.assertEqual(track.xs[track.base(0)], expected[0]["points"][0][0])
+                frames_dir = root / f"frames_{source}"
+                generate_frames(
+                    reference_image=reference_image,
+                    audio_features=audio_features,
+                    mouth_landmarks=mouth_landmarks,
+                    output_dir=frames_dir,
+                    frame_count=12,
+                )
+                rendered[source] = [path.read_bytes() for path in sorted(frames_dir.glob("*.png"))]
+            self.assertEqual(len(rendered["json"]), 12)
+            self.assertEqual(rendered["sidecar"], rendered["json"])
+
+    def test_reuse_silent_frames_links_canonical_frame(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            reference_image = root / "face.png"
+            audio_features = root / "audio_features.npy"
+            voice_activity = root / "voice_activity.json"
+            mouth_landmarks = root / "mouth_landmarks.json"
+            frames_dir = root / "frames"
+
+            reference_image.write_bytes(TINY_PNG)
+            write_npy_f32_matrix(audio_features, [[0.2, 0.1, 0.1]] * 2 + [[0.0, 0.0, 0.0]] * 4)
+            build_voice_activity(audio_features, voice_activity)
+            build_mouth_landmarks(reference_image, mouth_landmarks, frame_count=6)
+
+            result = generate_frames_with_backend(
+                reference_image=reference_image,
+                audio_features=audio_features,
+                mouth_landmarks=mouth_landmarks,
+                output_dir=frames_dir,
+                frame_count=6,
+                voice_activity=voice_activity,
+                reuse_silent_frames=True,
+            )
+
+            self.assertEqual(result["frames_rendered"], 3)
+            self.assertEqual(result["frames_reused"], 3)
+            self.assertGreaterEqual(float(result["render_time_saved_sec"]), 0.0)
+            files = sorted(frames_dir.glob("*.png"))
+            self.assertEqual(len(files), 6)
+            canonical = files[2].read_bytes()
+            for path in files[3:]:
+                self.assertEqual(path.read_bytes(), canonical)
+            self.assertNotEqual(files[1].read_bytes(), canonical)
+
+            result = generate_frames_with_backend(
+                reference_image=reference_image,
+                audio_features=audio_features,
+                mouth_landmarks=mouth_landmarks,
+                output_dir=frames_dir,
+                frame_count=6,
+                voice_activity=voice_activity,
+            )
+            self.assertEqual(result["frames_reused"], 0)
+            self.assertEqual(result["reuse_silent_frames"], False)
+            self.assertTrue(all(path.stat().st_nlink == 1 for path in frames_dir.glob("*.png")))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,11 +1,42 @@
 from __future__ import annotations
 
+import io
+import os
+import random
+import struct
+import subprocess
 import tempfile
+import time
 import unittest
+import zlib
 from pathlib import Path
+from contextlib import redirect_stdout
 from unittest import mock
 
-from pipeline.image_io import load_rgb_image
+from pipeline.feature_cache import hash_file
+from pipeline.image_io import (
+    DecodedImageCache,
+    DecoderBackend,
+    DecoderRegistry,
+    RgbSidecarCache,
+    _decode_png_rgb,
+    _unfilter_scanlines,
+    load_rgb_image,
+    build_decoder_registry,
+    load_rgb_images,
+    main,
+    sniff_image_format,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency path
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency path
+    Image = None
 
 TINY_PNG = (
     b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01"
@@ -14,7 +45,90 @@ TINY_PNG = (
 )
 
 
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def random_scanlines(rng: random.Random, width: int, height: int, bpp: int) -> bytes:
+    return b"".join(bytes([rng.randrange(5)]) + rng.randbytes(width * bpp) for _ in range(height))
+
+
+def build_png(
+    width: int,
+    height: int,
+    color_type: int,
+    scanlines: bytes,
+    bit_depth: int = 8,
+    interlace: int = 0,
+    extra_chunks: bytes = b"",
+) -> bytes:
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, interlace)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + png_chunk(b"IHDR", header)
+        + extra_chunks
+        + png_chunk(b"IDAT", zlib.compress(scanlines))
+        + png_chunk(b"IEND", b"")
+    )
+
+
+def pack_scanlines(rows: list[list[int]], bit_depth: int) -> bytes:
+    """Pack rows of samples with filter type None."""
+    out = bytearray()
+    for row in rows:
+        out.append(0)
+        if bit_depth == 16:
+            out.extend(struct.pack(f">{len(row)}H", *row))
+        elif bit_depth == 8:
+            out.extend(row)
+        else:
+            per_byte = 8 // bit_depth
+            padded = row + [0] * (-len(row) % per_byte)
+            for start in range(0, len(padded), per_byte):
+                value = 0
+                for sample in padded[start : start + per_byte]:
+                    value = (value << bit_depth) | sample
+                out.append(value)
+    return bytes(out)
+
+
+def adam7_scanlines(rows: list[list[int]], width: int, channels: int, bit_depth: int) -> bytes:
+    passes = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+    out = b""
+    for x0, y0, dx, dy in passes:
+        sub_rows = [
+            [value for x in range(x0, width, dx) for value in row[x * channels : (x + 1) * channels]]
+            for row in rows[y0::dy]
+        ]
+        if sub_rows and sub_rows[0]:
+            out += pack_scanlines(sub_rows, bit_depth)
+    return out
+
+
+def fake_ffmpeg_run(decode):
+    """subprocess.run stand-in whose ``ffmpeg -version`` probe succeeds; decodes go to ``decode``."""
+
+    def run(command, **kwargs):
+        if command[1:] == ["-version"]:
+            return subprocess.CompletedProcess(args=command, returncode=0, stdout=b"ffmpeg version", stderr=b"")
+        return decode(command)
+
+    return run
+
+
 class ImageIOTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # A zero budget stores nothing, so every load below really decodes.
+        patchers = [
+            mock.patch("pipeline.image_io.IMAGE_CACHE", DecodedImageCache(max_bytes=0)),
+            # Probes run under each test's subprocess mock; Pillow stays out of the way of the PNG tests.
+            mock.patch("pipeline.image_io.DECODERS", build_decoder_registry()),
+            mock.patch("pipeline.image_io.Image", None),
+        ]
+        self.cache, self.decoders, _ = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
     def test_load_rgb_image_png_exact(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             image = Path(tmp_dir) / "face.png"
@@ -37,6 +151,378 @@ class ImageIOTest(unittest.TestCase):
                 rgb = load_rgb_image(image, width=4, height=4)
             self.assertEqual(len(rgb), 4 * 4 * 3)
 
+    def test_load_rgb_images_splits_one_ffmpeg_batch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [Path(tmp_dir) / f"ref{i}.png" for i in range(3)]
+            for path in paths:
+                path.write_bytes(TINY_PNG)
+            frames = [bytes([i]) * (2 * 2 * 3) for i in range(3)]
+            done = subprocess.CompletedProcess(args=[], returncode=0, stdout=b"".join(frames), stderr=b"")
+            with mock.patch("pipeline.image_io.subprocess.run", return_value=done) as run:
+                images = load_rgb_images(paths, width=2, height=2)
+            self.assertEqual(images, frames)
+            # The one-time probe, then a single decode.
+            self.assertEqual(run.call_count, 2)
+            command = run.call_args.args[0]
+            self.assertEqual(command.count("-i"), 3)
+            self.assertIn("concat=n=3:v=1:a=0[out]", command[command.index("-filter_complex") + 1])
+
+    def test_load_rgb_images_falls_back_per_image_when_batch_fails(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [Path(tmp_dir) / f"ref{i}.png" for i in range(2)]
+            for path in paths:
+                path.write_bytes(TINY_PNG)
+            failed = subprocess.CompletedProcess(args=[], returncode=1, stdout=b"", stderr=b"bad input")
+            with mock.patch("pipeline.image_io.subprocess.run", side_effect=fake_ffmpeg_run(lambda command: failed)) as run:
+                images = load_rgb_images(paths, width=4, height=4)
+            # Probe, the batch, then one attempt per image.
+            self.assertEqual(run.call_count, 4)
+            self.assertEqual(images, [load_rgb_image(path, width=4, height=4) for path in paths])
+
+    def test_load_rgb_images_keeps_order_across_decode_workers(self) -> None:
+        def fake_ffmpeg(command):
+            indices = [int(Path(command[i + 1]).stem[3:]) for i, arg in enumerate(command) if arg == "-i"]
+            # Later shards finish first.
+            time.sleep(0.01 * (5 - indices[0]))
+            stdout = b"".join(bytes([index]) * (2 * 2 * 3) for index in indices)
+            return subprocess.CompletedProcess(args=command, returncode=0, stdout=stdout, stderr=b"")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [Path(tmp_dir) / f"ref{i}.png" for i in range(5)]
+            for path in paths:
+                path.write_bytes(TINY_PNG)
+            timings: list[dict[str, object]] = []
+            with mock.patch("pipeline.image_io.subprocess.run", side_effect=fake_ffmpeg_run(fake_ffmpeg)) as run:
+                images = load_rgb_images(paths, width=2, height=2, workers=3, timings=timings)
+            self.assertEqual(images, [bytes([i]) * 12 for i in range(5)])
+            # The probe, then shards of two, two and one image.
+            self.assertEqual(run.call_count, 4)
+            self.assertEqual([record["path"] for record in timings], [str(path) for path in paths])
+            self.assertEqual([record["source"] for record in timings], ["ffmpeg-batch"] * 4 + ["ffmpeg"])
+
+    @unittest.skipUnless(np is not None, "numpy not installed")
+    def test_numpy_unfilter_matches_python_for_every_filter_mix(self) -> None:
+        rng = random.Random(7)
+        cases = [(1, 1, 3), (5, 7, 4), (33, 9, 3), (3, 40, 1)]
+        for width, height, bpp in cases:
+            scanlines = random_scanlines(rng, width, height, bpp)
+            # Rows of a single filter type exercise the specialised paths.
+            for forced in (None, 1, 3, 4):
+                if forced is not None:
+                    scanlines = b"".join(
+                        bytes([forced]) + scanlines[row * (width * bpp + 1) + 1 : (row + 1) * (width * bpp + 1)]
+                        for row in range(height)
+                    )
+                expected = None
+                for numpy_module in (None, np):
+                    with mock.patch("pipeline.image_io.np", numpy_module), mock.patch(
+                        "pipeline.image_io._WAVEFRONT_BLOCK_ROWS", 4
+                    ):
+                        unpacked = _unfilter_scanlines(scanlines, width * bpp, bpp)
+                    expected = unpacked if expected is None else expected
+                    self.assertEqual(unpacked, expected)
+
+    def test_png_resize_box_averages_shrinking_axes(self) -> None:
+        pixels = [[0, 10, 20, 30], [40, 50, 60, 71]]
+        payload = build_png(4, 2, 0, pack_scanlines(pixels, 8))
+        # 2x2 boxes, rounded half up.
+        self.assertEqual(self.decode_both_engines(payload, 2, 1), bytes([25] * 3 + [45] * 3))
+        # 4 -> 3 columns: the middle output covers the right two thirds of x=1 and the left two thirds of x=2.
+        middle = (10 + 20 + 50 + 60 + 2) // 4
+        self.assertEqual(self.decode_both_engines(payload, 3, 1)[3], middle)
+        # Growing axes keep the nearest-neighbour mapping.
+        upscaled = self.decode_both_engines(payload, 8, 4)
+        self.assertEqual(upscaled[: 8 * 3 : 3], bytes([0, 0, 10, 10, 20, 20, 30, 30]))
+        self.assertEqual(upscaled[8 * 3 * 3 : 8 * 3 * 4 : 3], bytes([40, 40, 50, 50, 60, 60, 71, 71]))
+
+    def test_png_streaming_decode_is_block_size_invariant(self) -> None:
+        rng = random.Random(11)
+        payload = build_png(6, 9, 6, random_scanlines(rng, 6, 9, 4))
+        expected = {size: self.decode_both_engines(payload, *size) for size in ((6, 9), (4, 4), (9, 2))}
+        with mock.patch("pipeline.image_io._DECODE_BLOCK_ROWS", 2):
+            for size, rgb in expected.items():
+                self.assertEqual(self.decode_both_engines(payload, *size), rgb)
+
+    def decode_both_engines(self, payload: bytes, width: int, height: int) -> bytes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "face.png"
+            image.write_bytes(payload)
+            outputs = set()
+            with mock.patch("pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()):
+                for numpy_module in (np, None):
+                    with mock.patch("pipeline.image_io.np", numpy_module):
+                        outputs.add(load_rgb_image(image, width, height))
+        self.assertEqual(len(outputs), 1)
+        return outputs.pop()
+
+    def test_png_palette_and_grayscale_depths(self) -> None:
+        palette = bytes([10, 20, 30, 200, 100, 50, 0, 255, 0])
+        indices = [[0, 1, 2, 1, 0], [2, 2, 0, 1, 1]]
+        payload = build_png(
+            5,
+            2,
+            3,
+            pack_scanlines(indices, 2),
+            bit_depth=2,
+            extra_chunks=png_chunk(b"PLTE", palette) + png_chunk(b"tRNS", bytes([0, 128])),
+        )
+        expected = b"".join(palette[i * 3 : i * 3 + 3] for row in indices for i in row)
+        self.assertEqual(self.decode_both_engines(payload, 5, 2), expected)
+
+        gray = [[0, 1, 1], [1, 0, 1]]
+        payload = build_png(3, 2, 0, pack_scanlines(gray, 1), bit_depth=1)
+        self.assertEqual(self.decode_both_engines(payload, 3, 2), bytes(v * 255 for row in gray for v in row for _ in range(3)))
+
+        gray_alpha = [[0x1234, 0xFFFF, 0xAB00, 0x0000]]
+        payload = build_png(2, 1, 4, pack_scanlines(gray_alpha, 16), bit_depth=16)
+        self.assertEqual(self.decode_both_engines(payload, 2, 1), bytes([0x12] * 3 + [0xAB] * 3))
+
+        rgb16 = [[0x0102, 0x0304, 0x0506, 0xFFFF, 0x8000, 0x00FF]]
+        payload = build_png(2, 1, 2, pack_scanlines(rgb16, 16), bit_depth=16)
+        self.assertEqual(self.decode_both_engines(payload, 2, 1), bytes([1, 3, 5, 255, 128, 0]))
+
+    def test_png_adam7_matches_progressive(self) -> None:
+        rng = random.Random(5)
+        for width, height, color_type, channels, bit_depth in ((11, 9, 2, 3, 8), (10, 7, 0, 1, 4), (3, 2, 6, 4, 16)):
+            rows = [[rng.randrange(1 << bit_depth) for _ in range(width * channels)] for _ in range(height)]
+            progressive = build_png(width, height, color_type, pack_scanlines(rows, bit_depth), bit_depth=bit_depth)
+            interlaced = build_png(
+                width,
+                height,
+                color_type,
+                adam7_scanlines(rows, width, channels, bit_depth),
+                bit_depth=bit_depth,
+                interlace=1,
+            )
+            self.assertEqual(
+                self.decode_both_engines(interlaced, width, height),
+                self.decode_both_engines(progressive, width, height),
+            )
+
+    def test_image_cache_reuses_decodes_until_file_changes(self) -> None:
+        self.cache.resize(1 << 20)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [Path(tmp_dir) / f"ref{i}.png" for i in range(2)]
+            for path in paths:
+                path.write_bytes(build_png(1, 1, 0, b"\x00\x05"))
+            with mock.patch("pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()):
+                first = load_rgb_images(paths, width=2, height=2)
+                self.assertEqual(first, [bytes([5] * 12)] * 2)
+                self.assertEqual(load_rgb_image(paths[1], width=2, height=2), first[1])
+                self.assertEqual(load_rgb_images(paths, width=2, height=2), first)
+                decodes = self.decoders.stats()["png"]["calls"]
+                self.assertEqual(self.cache.stats()["hits"], 3)
+                # A different size or a rewritten file is a new key.
+                load_rgb_image(paths[0], width=4, height=4)
+                paths[1].write_bytes(build_png(1, 1, 0, b"\x00\x07"))
+                os.utime(paths[1], ns=(1, 1))
+                self.assertEqual(load_rgb_image(paths[1], width=2, height=2), bytes([7] * 12))
+                self.assertEqual(self.decoders.stats()["png"]["calls"], decodes + 2)
+            self.assertEqual(self.cache.stats()["misses"], 4)
+
+    def test_image_cache_skips_fallback_placeholders(self) -> None:
+        self.cache.resize(1 << 20)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "face.png"
+            image.write_bytes(TINY_PNG)
+            with mock.patch("pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()):
+                for _ in range(2):
+                    load_rgb_image(image, width=2, height=2)
+            self.assertEqual(self.decoders.stats()["png"]["calls"], 2)
+            self.assertEqual(self.cache.stats()["entries"], 0)
+            self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_image_cache_evicts_least_recently_used_within_budget(self) -> None:
+        cache = DecodedImageCache(max_bytes=10)
+        cache.put("a", b"x" * 4)
+        cache.put("b", b"y" * 4)
+        self.assertEqual(cache.get("a"), b"x" * 4)
+        cache.put("c", b"z" * 4)
+        self.assertIsNone(cache.get("b"))
+        cache.put("huge", b"w" * 11)
+        self.assertIsNone(cache.get("huge"))
+        cache.resize(4)
+        self.assertEqual(
+            cache.stats(), {"max_bytes": 4, "bytes": 4, "entries": 1, "hits": 1, "misses": 2, "evictions": 2}
+        )
+        self.assertEqual(cache.get("c"), b"z" * 4)
+
+    def test_rgb_sidecar_maps_decodes_keyed_by_content(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            first = root / "a.png"
+            first.write_bytes(build_png(1, 1, 0, b"\x00\x09"))
+            twin = root / "copy" / "b.png"
+            twin.parent.mkdir()
+            twin.write_bytes(first.read_bytes())
+            sidecar = RgbSidecarCache(root / "cache")
+            with mock.patch("pipeline.image_io.RGB_SIDECAR_CACHE", sidecar), mock.patch(
+                "pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()
+            ):
+                decoded = load_rgb_image(first, width=2, height=2)
+                self.assertEqual(sidecar.stats()["stores"], 1)
+                mapped = load_rgb_images([first, twin], width=2, height=2)
+                self.assertEqual(self.decoders.stats()["png"]["calls"], 1)
+                self.assertEqual(sidecar.stats()["hits"], 2)
+                for rgb in mapped:
+                    self.assertIsInstance(rgb, memoryview)
+                    self.assertEqual(bytes(rgb), decoded)
+                del rgb, mapped
+                # A damaged entry is a miss and is rewritten from a fresh decode.
+                (entry,) = (root / "cache").glob("*/*.rgb")
+                entry.write_bytes(entry.read_bytes()[:-1])
+                self.assertEqual(bytes(load_rgb_image(first, width=2, height=2)), decoded)
+                self.assertEqual(self.decoders.stats()["png"]["calls"], 2)
+                self.assertEqual(sidecar.stats()["stores"], 2)
+
+    def test_rgb_sidecar_skips_fallback_placeholders(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            image = root / "face.png"
+            image.write_bytes(TINY_PNG)
+            sidecar = RgbSidecarCache(root / "cache")
+            with mock.patch("pipeline.image_io.RGB_SIDECAR_CACHE", sidecar), mock.patch(
+                "pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()
+            ):
+                load_rgb_image(image, width=2, height=2)
+                self.assertEqual(list((root / "cache").glob("*/*.rgb")), [])
+                self.assertNotIsInstance(load_rgb_image(image, width=2, height=2), memoryview)
+            self.assertEqual(self.decoders.stats()["png"]["calls"], 2)
+            self.assertEqual(sidecar.stats()["stores"], 0)
+
+    def test_rgb_sidecar_keeps_backends_apart_in_a_shared_directory(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            image = root / "face.png"
+            image.write_bytes(build_png(1, 1, 0, b"\x00\x09"))
+            sidecar = RgbSidecarCache(root / "cache")
+            # Written by a node whose Pillow resamples differently.
+            sidecar.store(hash_file(image), 2, 2, "pillow", bytes([1]) * 12)
+            with mock.patch("pipeline.image_io.RGB_SIDECAR_CACHE", sidecar), mock.patch(
+                "pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()
+            ):
+                self.assertEqual(bytes(load_rgb_image(image, width=2, height=2)), bytes([9]) * 12)
+                self.assertEqual(bytes(load_rgb_image(image, width=2, height=2)), bytes([9]) * 12)
+            self.assertEqual(self.decoders.stats()["png"]["calls"], 1)
+            self.assertEqual(
+                sorted(path.name.rsplit("-", 1)[1] for path in (root / "cache").glob("*/*.rgb")), ["pillow.rgb", "png.rgb"]
+            )
+
+    def test_rgb_sidecar_evicts_oldest_entries_over_budget(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sidecar = RgbSidecarCache(Path(tmp_dir), max_bytes=3 * (16 + 12))
+            for index, digest in enumerate(("aa11", "bb22", "cc33")):
+                sidecar.store(digest, 2, 2, "png", bytes([index]) * 12)
+                os.utime(sidecar.entry_path(digest, 2, 2, "png"), ns=(index, index))
+            self.assertEqual(sidecar.store("dd44", 2, 2, "png", bytes(12)), 1)
+            self.assertIsNone(sidecar.fetch("aa11", 2, 2, "png"))
+            self.assertEqual(bytes(sidecar.fetch("bb22", 2, 2, "png")), bytes([1]) * 12)
+            self.assertIsNone(sidecar.fetch("bb22", 4, 4, "png"))
+            # Another backend's decode of the same content is a different entry.
+            self.assertIsNone(sidecar.fetch("bb22", 2, 2, "pillow"))
+
+    def test_warm_cli_fills_sidecar_for_each_size(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            references = Path(tmp_dir) / "refs"
+            references.mkdir()
+            for name in ("a.png", "b.png"):
+                (references / name).write_bytes(build_png(1, 1, 0, b"\x00\x05"))
+            (references / "notes.txt").write_text("skip", encoding="utf-8")
+            cache_dir = Path(tmp_dir) / "cache"
+            argv = [str(references), "--cache-dir", str(cache_dir), "--size", "2x2", "--size", "3"]
+            with mock.patch("pipeline.image_io.RGB_SIDECAR_CACHE", None), mock.patch(
+                "pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()
+            ):
+                for expected in ("reused=0 stored=4", "reused=4 stored=0"):
+                    output = io.StringIO()
+                    with redirect_stdout(output):
+                        self.assertEqual(main(argv), 0)
+                    summary = f"METRIC: image_cache_warm_completed cache_dir={cache_dir} images=2 {expected}"
+                    self.assertIn(summary, output.getvalue())
+            # Identical content shares an entry per size.
+            self.assertEqual(sorted(path.name.split("-", 1)[1] for path in cache_dir.glob("*/*.rgb")), ["2x2-png.rgb", "3x3-png.rgb"])
+
+    def test_decoder_registry_probes_once_and_routes_by_format(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "face.jpg"
+            image.write_bytes(build_png(1, 1, 0, b"\x00\x05"))
+            other = Path(tmp_dir) / "face.bin"
+            other.write_bytes(b"\xff\xd8\xff\xe0 not really a jpeg")
+            self.assertEqual(sniff_image_format(image), "png")
+            self.assertEqual(sniff_image_format(other), "jpeg")
+            with mock.patch("pipeline.image_io.subprocess.run", side_effect=FileNotFoundError()) as run:
+                for _ in range(3):
+                    load_rgb_image(image, width=2, height=2)
+                # No decoder handles a JPEG without ffmpeg or Pillow.
+                self.assertEqual(len(load_rgb_image(other, width=2, height=2)), 12)
+            self.assertEqual(run.call_count, 1)
+            stats = self.decoders.stats()
+            self.assertEqual(stats["ffmpeg"]["available"], False)
+            self.assertEqual(stats["pillow"]["available"], False)
+            self.assertEqual((stats["png"]["calls"], stats["png"]["failures"]), (3, 0))
+
+    def test_decoder_registry_disables_backend_failing_on_a_format(self) -> None:
+        calls = []
+
+        def flaky(path: Path, width: int, height: int) -> bytes | None:
+            calls.append(path)
+            return None
+
+        registry = DecoderRegistry(
+            [
+                DecoderBackend("flaky", flaky, lambda: True),
+                DecoderBackend("png", lambda path, width, height: bytes(width * height * 3), lambda: True, frozenset({"png"})),
+            ],
+            disable_after=2,
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "face.png"
+            image.write_bytes(TINY_PNG)
+            results = [registry.decode(image, 1, 1)[1] for _ in range(4)]
+            # A file nobody decodes is not held against the backends.
+            unreadable = DecoderRegistry([DecoderBackend("flaky", flaky, lambda: True)], disable_after=1)
+            self.assertEqual(unreadable.decode(image, 1, 1)[1], "fallback")
+            self.assertEqual(unreadable.preferred("png"), "flaky")
+        self.assertEqual(results, ["png"] * 4)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(registry.preferred("png"), "png")
+        self.assertEqual(registry.preferred("jpeg"), "flaky")
+        self.assertEqual(registry.stats()["flaky"]["disabled_formats"], ["png"])
+        self.assertEqual(registry.stats()["flaky"]["calls"], 2)
+
+    @unittest.skipUnless(Image is not None, "Pillow not installed")
+    def test_pillow_backend_decodes_png(self) -> None:
+        rows = [[0, 10, 20, 30], [40, 50, 60, 71]]
+        payload = build_png(4, 2, 0, pack_scanlines(rows, 8))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "face.png"
+            image.write_bytes(payload)
+            with mock.patch("pipeline.image_io.Image", Image):
+                registry = build_decoder_registry()
+                rgb, source = registry.decode(image, 4, 2)
+        self.assertEqual(source, "pillow")
+        self.assertEqual(rgb, bytes(value for row in rows for value in row for _ in range(3)))
+
+    @unittest.skipUnless(Image is not None, "Pillow not installed")
+    def test_pillow_backend_scales_16_bit_grayscale(self) -> None:
+        payload = build_png(4, 1, 0, pack_scanlines([[0x4000, 0x40FF, 0xFFFF, 0x00FF]], 16), bit_depth=16)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "face.png"
+            image.write_bytes(payload)
+            with mock.patch("pipeline.image_io.Image", Image):
+                registry = build_decoder_registry()
+                rgb, source = registry.decode(image, 4, 1)
+            self.assertEqual(source, "pillow")
+            self.assertEqual(rgb, _decode_png_rgb(image, 4, 1))
+        self.assertEqual(rgb, bytes(value for value in (0x40, 0x40, 0xFF, 0x00) for _ in range(3)))
+
+    def test_png_rejects_truncated_image_data(self) -> None:
+        payload = build_png(4, 4, 2, pack_scanlines([[0] * 12] * 3, 8))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "face.png"
+            image.write_bytes(payload)
+            self.assertIsNone(_decode_png_rgb(image, 4, 4))
+
 
 if __name__ == "__main__":
     unittest.main()
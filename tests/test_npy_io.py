@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pipeline.npy_io import (
+    NPY_RESERVED_HEADER_BYTES,
+    NpyF32Writer,
+    open_npy_f32_rows,
+    quantization_sidecar_path,
+    quantize_npy_f32,
+    read_npy_f32_matrix,
+    write_npy_f32_matrix,
+    write_npy_quantized_matrix,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency path
+    np = None
+
+
+def read_header(path: Path) -> tuple[str, int]:
+    raw = path.read_bytes()
+    header_len = int.from_bytes(raw[8:10], "little")
+    return raw[10 : 10 + header_len].decode("latin1"), 10 + header_len
+
+
+class NpyIOTest(unittest.TestCase):
+    def test_writer_appends_rows_and_patches_shape(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.npy"
+            with NpyF32Writer(path) as writer:
+                writer.append([[1.0, 2.0, 3.0]])
+                writer.append([[4.0, 5.0, 6.0], [7.0, 8.0, 9.0]])
+                self.assertEqual(writer.rows, 3)
+
+            header, offset = read_header(path)
+            self.assertEqual(offset, NPY_RESERVED_HEADER_BYTES)
+            self.assertEqual(re.search(r"'shape': \((\d+), (\d+)\)", header).groups(), ("3", "3"))
+            values = struct.unpack("<9f", path.read_bytes()[offset:])
+            self.assertEqual(values, tuple(float(v) for v in range(1, 10)))
+
+    def test_writer_rejects_row_shape_change(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with NpyF32Writer(Path(tmp_dir) / "rows.npy") as writer:
+                writer.append([[1.0, 2.0]])
+                with self.assertRaises(ValueError):
+                    writer.append([[1.0, 2.0, 3.0]])
+
+    def test_write_npy_f32_matrix_empty(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "empty.npy"
+            write_npy_f32_matrix(path, [])
+            header, offset = read_header(path)
+            self.assertIn("'shape': (0, 0)", header)
+            self.assertEqual(len(path.read_bytes()), offset)
+
+    @unittest.skipUnless(np is not None, "numpy not installed")
+    def test_writer_output_loads_with_numpy(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.npy"
+            with NpyF32Writer(path) as writer:
+                writer.append(np.arange(6, dtype=np.float64).reshape(2, 3))
+                writer.append([[6.0, 7.0, 8.0]])
+            loaded = np.load(path)
+            self.assertEqual(loaded.dtype, np.float32)
+            self.assertEqual(loaded.shape, (3, 3))
+            self.assertEqual(loaded.ravel().tolist(), [float(v) for v in range(9)])
+
+    def test_row_accessor_matches_matrix_with_and_without_numpy(self) -> None:
+        matrix = [[float(r * 3 + c) for c in range(3)] for r in range(5)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.npy"
+            write_npy_f32_matrix(path, matrix)
+            for numpy_module in (np, None):
+                with mock.patch("pipeline.npy_io.np", numpy_module):
+                    with open_npy_f32_rows(path) as rows:
+                        self.assertEqual(len(rows), 5)
+                        self.assertEqual(rows[2], matrix[2])
+                        self.assertEqual(rows[-1], matrix[-1])
+                        with self.assertRaises(IndexError):
+                            rows[5]
+                    self.assertEqual(read_npy_f32_matrix(path), matrix)
+
+    def test_writer_accepts_nested_rows(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "track.npy"
+            with NpyF32Writer(path, row_shape=(2, 2)) as writer:
+                writer.append([[[1.0, 2.0], [3.0, 4.0]], [[5.0, 6.0], [7.0, 8.0]]])
+            with open_npy_f32_rows(path) as rows:
+                self.assertEqual(rows.shape, (2, 2, 2))
+                self.assertEqual(rows[1], [5.0, 6.0, 7.0, 8.0])
+
+    def test_writer_float64_rows_round_trip_exactly(self) -> None:
+        rows_in = [[[0.1, 0.64], [0.62 + 0.015, 1.0 / 3.0]]]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "track.npy"
+            for numpy_module in (np, None):
+                with mock.patch("pipeline.npy_io.np", numpy_module):
+                    with NpyF32Writer(path, row_shape=(2, 2), descr="<f8") as writer:
+                        writer.append(rows_in)
+                    header, offset = read_header(path)
+                    self.assertIn("'descr': '<f8'", header)
+                    self.assertIn("'shape': (1, 2, 2)", header)
+                    values = struct.unpack("<4d", path.read_bytes()[offset:])
+                    self.assertEqual(list(values), [value for point in rows_in[0] for value in point])
+            with self.assertRaises(ValueError):
+                NpyF32Writer(path, descr="<i4")
+
+    def test_iter_column_matches_row_access_across_blocks(self) -> None:
+        # More rows than one read block, so the column crosses block boundaries.
+        matrix = [[math.sin(r * 0.01), r / 9000.0, float(r % 7)] for r in range(9000)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            for numpy_module in (np, None):
+                with mock.patch("pipeline.npy_io.np", numpy_module):
+                    for scheme in ("none", "float16", "uint8"):
+                        path = root / f"{scheme}.npy"
+                        if scheme == "none":
+                            write_npy_f32_matrix(path, matrix)
+                        else:
+                            write_npy_quantized_matrix(path, matrix, scheme)
+                        with open_npy_f32_rows(path) as rows:
+                            for column in range(3):
+                                expected = [rows[index][column] for index in range(len(rows))]
+                                self.assertEqual(list(rows.iter_column(column)), expected, (scheme, column))
+                            with self.assertRaises(IndexError):
+                                next(rows.iter_column(3))
+
+    def test_quantized_matrices_dequantize_on_access(self) -> None:
+        matrix = [[0.0, 0.25, 3.0], [0.5, 0.125, 3.0], [1.0, 0.75, 3.0], [0.3, 1.0, 3.0]]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            outputs = {}
+            for numpy_module in (np, None):
+                with mock.patch("pipeline.npy_io.np", numpy_module):
+                    for scheme in ("float16", "uint8"):
+                        path = root / f"{scheme}.npy"
+                        meta = write_npy_quantized_matrix(path, matrix, scheme)
+                        self.assertEqual(meta["scheme"], scheme)
+                        outputs.setdefault(scheme, set()).add(path.read_bytes())
+                        with open_npy_f32_rows(path) as rows:
+                            self.assertEqual(rows.quantization, scheme)
+                            tolerance = 1e-3 if scheme == "float16" else 0.5 / 255.0 + 1e-9
+                            for got, want in zip(rows[3], matrix[3]):
+                                self.assertLessEqual(abs(got - want), tolerance)
+                            self.assertEqual(rows[0][2], 3.0)
+
+            sidecar = json.loads(quantization_sidecar_path(root / "uint8.npy").read_text(encoding="utf-8"))
+            self.assertEqual(sidecar["offset"], [0.0, 0.125, 3.0])
+            self.assertEqual(sidecar["scale"][2], 0.0)
+            self.assertEqual(len((root / "uint8.npy").read_bytes()) - read_header(root / "uint8.npy")[1], 12)
+            # NumPy and pure-Python quantizers produce identical files.
+            self.assertEqual(len(outputs["float16"]), 1)
+            self.assertEqual(len(outputs["uint8"]), 1)
+
+    def test_quantize_rejects_unknown_scheme(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "rows.npy"
+            write_npy_f32_matrix(path, [[1.0]])
+            with self.assertRaises(ValueError):
+                quantize_npy_f32(path, path, "int4")
+
+    def test_row_accessor_empty_matrix(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "empty.npy"
+            with NpyF32Writer(path, row_shape=(3,)):
+                pass
+            for numpy_module in (np, None):
+                with mock.patch("pipeline.npy_io.np", numpy_module):
+                    with open_npy_f32_rows(path) as rows:
+                        self.assertEqual(len(rows), 0)
+
+    def test_row_accessor_rejects_invalid_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "bad.npy"
+            path.write_bytes(b"not an npy file")
+            with self.assertRaises(ValueError):
+                open_npy_f32_rows(path)
+
+    @unittest.skipUnless(np is not None, "numpy not installed")
+    def test_row_accessor_reads_numpy_saved_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "saved.npy"
+            np.save(path, np.arange(8, dtype="<f4").reshape(4, 2))
+            with mock.patch("pipeline.npy_io.np", None):
+                with open_npy_f32_rows(path) as rows:
+                    self.assertEqual([rows[i] for i in range(len(rows))], [[0.0, 1.0], [2.0, 3.0], [4.0, 5.0], [6.0, 7.0]])
+            np.save(path, np.zeros((2, 2), dtype="<f8"))
+            with self.assertRaises(ValueError):
+                open_npy_f32_rows(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
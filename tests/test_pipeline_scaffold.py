@@ -165,12 +165,85 @@ class PipelineScaffoldTest(unittest.TestCase):
             self.assertEqual(manifest["stages"]["generator"]["vit_overfit_guard_strength"], 0.25)
             self.assertEqual(manifest["stages"]["generator"]["temporal_spatial_loss_weight"], 0.5)
             self.assertEqual(manifest["stages"]["generator"]["temporal_smooth_factor"], 0.4)
+            self.assertEqual(manifest["stages"]["generator"]["image_cache_max_bytes"], 64 * 1024 * 1024)
+            self.assertEqual(manifest["stages"]["generator"]["image_cache_misses"], 2)
+            self.assertEqual(manifest["stages"]["generator"]["image_cache_hits"], 0)
+            self.assertEqual(manifest["stages"]["generator"]["vit_decode_workers"], 4)
+            decode = manifest["stages"]["generator"]["vit_reference_decode"]
+            self.assertEqual(len(decode), 2)
+            self.assertTrue(all(record["decode_sec"] >= 0.0 for record in decode))
+            decoders = manifest["stages"]["generator"]["image_decoders"]
+            self.assertEqual(set(decoders), {"pillow", "ffmpeg", "png"})
+            self.assertGreaterEqual(sum(stats["calls"] for stats in decoders.values()), 2)
 
             meta = json.loads((workspace / "output.mp4.meta.json").read_text(encoding="utf-8"))
             self.assertEqual(meta["fps"], 15)
             self.assertEqual(meta["watermark_enabled"], True)
             self.assertTrue((workspace / "output.mp4.watermark.json").is_file())
 
+    def test_scaffold_pipeline_reuses_cached_audio_features(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            reference_image = root / "face.png"
+            cache_dir = root / "feature-cache"
+            self.write_sine_wav(input_audio)
+            self.write_png(reference_image)
+
+            hits = []
+            for name in ("first", "second"):
+                workspace = root / name
+                result = self.run_cmd(
+                    "--input-audio",
+                    str(input_audio),
+                    "--reference-image",
+                    str(reference_image),
+                    "--workspace",
+                    str(workspace),
+                    "--feature-cache-dir",
+                    str(cache_dir),
+                )
+                self.assertEqual(result.returncode, 0, msg=result.stdout + result.stderr)
+                manifest = json.loads((workspace / "pipeline_run.json").read_text(encoding="utf-8"))
+                hits.append(manifest["stages"]["preprocessor"]["feature_cache_hit"])
+
+            self.assertEqual(hits, [False, True])
+            self.assertEqual(
+                (root / "first" / "audio_features.npy").read_bytes(),
+                (root / "second" / "audio_features.npy").read_bytes(),
+            )
+
+    def test_scaffold_pipeline_quantizes_audio_features(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            reference_image = root / "face.png"
+            self.write_sine_wav(input_audio)
+            self.write_png(reference_image)
+
+            sizes = {}
+            for scheme in ("none", "uint8"):
+                workspace = root / scheme
+                result = self.run_cmd(
+                    "--input-audio",
+                    str(input_audio),
+                    "--reference-image",
+                    str(reference_image),
+                    "--workspace",
+                    str(workspace),
+                    "--feature-quantization",
+                    scheme,
+                )
+                self.assertEqual(result.returncode, 0, msg=result.stdout + result.stderr)
+                manifest = json.loads((workspace / "pipeline_run.json").read_text(encoding="utf-8"))
+                stage = manifest["stages"]["preprocessor"]
+                self.assertEqual(stage["feature_quantization"], scheme)
+                sizes[scheme] = stage["audio_features_bytes"]
+
+            self.assertTrue((root / "uint8" / "audio_features.quant.json").is_file())
+            self.assertFalse((root / "none" / "audio_features.quant.json").exists())
+            self.assertLess(sizes["uint8"], sizes["none"])
+
     def test_scaffold_pipeline_disables_watermark(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             root = Path(tmp_dir)
@@ -375,6 +448,28 @@ class PipelineScaffoldTest(unittest.TestCase):
             self.assertNotEqual(result.returncode, 0)
             self.assertIn("ERROR: invalid_vit_grid", result.stdout)
 
+    def test_scaffold_pipeline_rejects_invalid_preprocess_workers(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            reference_image = root / "face.png"
+            workspace = root / "workspace"
+            self.write_sine_wav(input_audio)
+            self.write_png(reference_image)
+
+            result = self.run_cmd(
+                "--input-audio",
+                str(input_audio),
+                "--reference-image",
+                str(reference_image),
+                "--workspace",
+                str(workspace),
+                "--preprocess-workers",
+                "0",
+            )
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("ERROR: invalid_preprocess_workers", result.stdout)
+
     def test_scaffold_pipeline_rejects_missing_vit_reference_dir(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             root = Path(tmp_dir)
@@ -1,15 +1,55 @@
 from __future__ import annotations
 
+import contextlib
+import io
 import json
 import math
+import os
 import re
 import struct
+import sys
 import tempfile
+import threading
 import unittest
 import wave
+import zipfile
 from pathlib import Path
+from unittest import mock
 
-from pipeline.preprocess import build_mouth_landmarks, extract_audio_features, get_image_size
+from pipeline.generator import LandmarkTrack
+from pipeline.npy_io import open_npy_f32_rows, read_npy_header, write_npy_f32_matrix
+from pipeline.preprocess import (
+    build_mouth_landmarks,
+    build_voice_activity,
+    collect_batch_clips,
+    compute_window_features,
+    detect_silent_segments,
+    extract_audio_features,
+    get_image_size,
+    iter_batch_audio_features,
+    iter_feature_rows,
+    iter_resampled_blocks,
+    main,
+    numpy_available,
+    read_wav_info,
+    read_wav_mono,
+    resolve_feature_engine,
+)
+
+FAKE_FFMPEG = """#!{python}
+import math, struct, sys
+args = sys.argv[1:]
+if "fail" in args[args.index("-i") + 1]:
+    sys.stderr.write("boom\\n")
+    sys.exit(1)
+if "noisy" in args[args.index("-i") + 1]:
+    # Far more than a pipe buffer, written before any audio, like a damaged MP3.
+    sys.stderr.write("[mp3float] Header missing\\n" * 10000)
+rate = int(args[args.index("-ar") + 1])
+frames = int(0.3 * rate)
+values = [int(0.4 * 32767.0 * math.sin((2.0 * math.pi * 440.0 * i) / rate)) for i in range(frames)]
+sys.stdout.buffer.write(struct.pack("<%dh" % frames, *values))
+"""
 
 TINY_PNG = (
     b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01"
@@ -43,6 +83,29 @@ class PreprocessTest(unittest.TestCase):
             handle.setframerate(sample_rate)
             handle.writeframes(bytes(payload))
 
+    def write_raw_wav(
+        self,
+        path: Path,
+        format_tag: int,
+        channels: int,
+        sample_width: int,
+        payload: bytes,
+        sample_rate: int = 16000,
+    ) -> None:
+        block_align = channels * sample_width
+        fmt = struct.pack(
+            "<HHIIHH",
+            format_tag,
+            channels,
+            sample_rate,
+            sample_rate * block_align,
+            block_align,
+            sample_width * 8,
+        )
+        body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        body += b"data" + struct.pack("<I", len(payload)) + payload
+        path.write_bytes(b"RIFF" + struct.pack("<I", len(body)) + body)
+
     def test_extract_audio_features_writes_npy(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             root = Path(tmp_dir)
@@ -57,6 +120,319 @@ class PreprocessTest(unittest.TestCase):
             self.assertGreater(rows, 0)
             self.assertEqual(rows, shape[0])
 
+    @unittest.skipUnless(numpy_available(), "numpy not installed")
+    def test_numpy_engine_matches_python_engine(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            python_npy = root / "python.npy"
+            numpy_npy = root / "numpy.npy"
+            self.write_sine_wav(input_audio)
+
+            python_rows = extract_audio_features(input_audio, python_npy, engine="python")
+            numpy_rows = extract_audio_features(input_audio, numpy_npy, engine="numpy")
+            self.assertEqual(python_rows, numpy_rows)
+            self.assertEqual(python_npy.read_bytes(), numpy_npy.read_bytes())
+
+    def test_compute_window_features_short_clip_uses_single_window(self) -> None:
+        samples = [0.5, -0.5, 0.25, -0.25]
+        matrix = compute_window_features(samples, sample_rate=16000, engine="python")
+        self.assertEqual(len(matrix), 1)
+        rms, zcr, mean_abs = matrix[0]
+        self.assertAlmostEqual(mean_abs, 0.375)
+        self.assertAlmostEqual(zcr, 1.0)
+        self.assertAlmostEqual(rms, math.sqrt((0.25 + 0.25 + 0.0625 + 0.0625) / 4.0))
+
+    def test_streaming_blocks_match_whole_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            whole_npy = root / "whole.npy"
+            self.write_sine_wav(input_audio)
+
+            extract_audio_features(input_audio, whole_npy, block_frames=1 << 20)
+            for block_frames in (1, 97, 400, 4096):
+                streamed_npy = root / f"streamed_{block_frames}.npy"
+                extract_audio_features(input_audio, streamed_npy, block_frames=block_frames)
+                self.assertEqual(streamed_npy.read_bytes(), whole_npy.read_bytes())
+
+    def test_mmap_input_mode_matches_stream(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            stream_npy = root / "stream.npy"
+            mmap_npy = root / "mmap.npy"
+            self.write_sine_wav(input_audio)
+
+            extract_audio_features(input_audio, stream_npy, block_frames=500)
+            rows = extract_audio_features(input_audio, mmap_npy, block_frames=500, input_mode="mmap")
+            self.assertEqual(rows, parse_npy_shape(mmap_npy)[0])
+            self.assertEqual(mmap_npy.read_bytes(), stream_npy.read_bytes())
+
+    def test_mmap_input_mode_handles_empty_data_chunk(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "empty.wav"
+            output_npy = root / "features.npy"
+            self.write_raw_wav(input_audio, format_tag=1, channels=1, sample_width=2, payload=b"")
+
+            rows = extract_audio_features(input_audio, output_npy, input_mode="mmap")
+            self.assertEqual(rows, 1)
+            self.assertEqual(parse_npy_shape(output_npy), (1, 3))
+
+    def test_frame_aligned_sampling_emits_one_row_per_video_frame(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            output_npy = root / "features.npy"
+            self.write_sine_wav(input_audio, seconds=0.3)
+
+            rows = extract_audio_features(input_audio, output_npy, frame_fps=25, block_frames=777)
+            self.assertEqual(rows, 8)
+            self.assertEqual(parse_npy_shape(output_npy), (8, 3))
+
+    def test_frame_aligned_windows_are_centred_and_clamped(self) -> None:
+        samples = [float(i) for i in range(100)]
+        matrix = compute_window_features(
+            samples,
+            sample_rate=100,
+            window_ms=300.0,
+            engine="python",
+            frame_fps=10,
+        )
+        self.assertEqual(len(matrix), 10)
+        # Frame 0 clamps to the clip start, frame 5 is centred on sample 50, frame 9 clamps to the end.
+        self.assertAlmostEqual(matrix[0][2], sum(range(0, 30)) / 30.0)
+        self.assertAlmostEqual(matrix[5][2], sum(range(35, 65)) / 30.0)
+        self.assertAlmostEqual(matrix[9][2], sum(range(70, 100)) / 30.0)
+
+    def test_sharded_workers_match_serial(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            self.write_sine_wav(input_audio, seconds=0.5)
+
+            for frame_fps in (None, 25):
+                serial_npy = root / "serial.npy"
+                sharded_npy = root / "sharded.npy"
+                extract_audio_features(input_audio, serial_npy, frame_fps=frame_fps)
+                with mock.patch("pipeline.preprocess._SHARD_MIN_ROWS", 4):
+                    extract_audio_features(input_audio, sharded_npy, frame_fps=frame_fps, workers=2)
+                self.assertEqual(sharded_npy.read_bytes(), serial_npy.read_bytes())
+
+    def test_analysis_rate_resampling_is_engine_block_and_shard_invariant(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            self.write_sine_wav(input_audio, seconds=0.5, sample_rate=48000)
+
+            reference = root / "reference.npy"
+            rows = extract_audio_features(input_audio, reference, engine="python", analysis_rate=16000)
+            self.assertEqual(rows, (8000 - 400) // 160 + 1)
+            variants = [
+                {"engine": "python", "block_frames": 997},
+                {"engine": "python", "workers": 2},
+            ]
+            if numpy_available():
+                variants.append({"engine": "numpy", "block_frames": 4096})
+            for kwargs in variants:
+                candidate = root / "candidate.npy"
+                with mock.patch("pipeline.preprocess._SHARD_MIN_ROWS", 4):
+                    extract_audio_features(input_audio, candidate, analysis_rate=16000, **kwargs)
+                self.assertEqual(candidate.read_bytes(), reference.read_bytes(), kwargs)
+
+    def test_iter_resampled_blocks_preserves_tone(self) -> None:
+        source = [math.sin(2.0 * math.pi * 1000.0 * i / 44100) for i in range(8820)]
+        blocks = [source[i : i + 1234] for i in range(0, len(source), 1234)]
+        output = [value for block in iter_resampled_blocks(blocks, 44100, 16000) for value in block]
+        self.assertEqual(len(output), 3200)
+        for i in range(200, 3000):
+            self.assertAlmostEqual(output[i], math.sin(2.0 * math.pi * 1000.0 * i / 16000), places=3)
+
+    @unittest.skipUnless(numpy_available(), "numpy not installed")
+    def test_spectral_feature_set_appends_log_mel_bands(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            input_audio = root / "input.wav"
+            basic_npy = root / "basic.npy"
+            spectral_npy = root / "spectral.npy"
+            sharded_npy = root / "sharded.npy"
+            self.write_sine_wav(input_audio, seconds=0.5)
+
+            rows = extract_audio_features(input_audio, basic_npy, engine="numpy")
+            self.assertEqual(
+                extract_audio_features(input_audio, spectral_npy, engine="numpy", feature_set="spectral", n_mels=24),
+                rows,
+            )
+            with mock.patch("pipeline.preprocess._SHARD_MIN_ROWS", 4):
+                extract_audio_features(
+                    input_audio, sharded_npy, engine="numpy", feature_set="spectral", n_mels=24, workers=2
+                )
+            self.assertEqual(sharded_npy.read_bytes(), spectral_npy.read_bytes())
+
+            with open_npy_f32_rows(basic_npy) as basic, open_npy_f32_rows(spectral_npy) as spectral:
+                self.assertEqual(spectral.shape, (rows, 3 + 24))
+                for index in (0, rows // 2, rows - 1):
+                    self.assertEqual(spectral[index][:3], basic[index])
+                # The 440 Hz test tone dominates; the loudest band must be the one covering it.
+                bands = spectral[rows // 2][3:]
+                loudest = bands.index(max(bands))
+                top_mel = 2595.0 * math.log10(1.0 + 8000.0 / 700.0)
+                edges = [700.0 * (10.0 ** (top_mel * i / 25 / 2595.0) - 1.0) for i in range(26)]
+                self.assertLess(edges[loudest], 440.0)
+                self.assertGreater(edges[loudest + 2], 440.0)
+
+    def test_spectral_feature_set_requires_numpy(self) -> None:
+        with self.assertRaises(RuntimeError):
+            compute_window_features([0.0] * 800, 16000, engine="python", feature_set="spectral")
+        with self.assertRaises(ValueError):
+            compute_window_features([0.0] * 800, 16000, feature_set="mfcc")
+
+    def install_fake_ffmpeg(self, root: Path) -> dict[str, str]:
+        bin_dir = root / "bin"
+        bin_dir.mkdir()
+        script = bin_dir / "ffmpeg"
+        script.write_text(FAKE_FFMPEG.format(python=sys.executable), encoding="utf-8")
+        script.chmod(0o755)
+        return {"PATH": str(bin_dir)}
+
+    def test_non_wav_input_streams_through_ffmpeg_pipe(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            reference_wav = root / "input.wav"
+            encoded = root / "input.mp3"
+            self.write_sine_wav(reference_wav, seconds=0.3, sample_rate=16000)
+            encoded.write_bytes(b"ID3\x03" + bytes(64))
+            expected = root / "expected.npy"
+            extract_audio_features(reference_wav, expected)
+
+            with mock.patch.dict(os.environ, self.install_fake_ffmpeg(root)):
+                for kwargs in ({"block_frames": 1001}, {"workers": 2}):
+                    output = root / "output.npy"
+                    extract_audio_features(encoded, output, analysis_rate=16000, **kwargs)
+                    self.assertEqual(output.read_bytes(), expected.read_bytes(), kwargs)
+                with self.assertRaises(RuntimeError):
+                    (root / "fail.mp3").write_bytes(b"ID3\x03")
+                    extract_audio_features(root / "fail.mp3", root / "output.npy")
+
+                noisy = root / "noisy.mp3"
+                noisy.write_bytes(encoded.read_bytes())
+                worker = threading.Thread(
+                    target=extract_audio_features, args=(noisy, root / "noisy.npy"), kwargs={"analysis_rate": 16000}, daemon=True
+                )
+                worker.start()
+                worker.join(timeout=30)
+                self.assertFalse(worker.is_alive(), "ffmpeg stderr flood deadlocked the decode")
+                self.assertEqual((root / "noisy.npy").read_bytes(), expected.read_bytes())
+
+            with mock.patch.dict(os.environ, {"PATH": str(root / "missing")}):
+                with self.assertRaises(ValueError):
+                    extract_audio_features(encoded, root / "output.npy")
+
+    def test_batch_archive_members_match_single_clip_extraction(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            (root / "clips" / "nested").mkdir(parents=True)
+            self.write_sine_wav(root / "clips" / "a.wav", seconds=0.2)
+            self.write_sine_wav(root / "clips" / "nested" / "b.wav", seconds=0.4)
+            (root / "clips" / "broken.wav").write_bytes(b"RIFF\x00\x00\x00\x00WAVEjunk")
+            clips = collect_batch_clips([root / "clips"])
+            self.assertEqual([key for key, _ in clips], ["a", "broken", "nested/b"])
+
+            for workers in (1, 2):
+                archive = root / f"features_{workers}.npz"
+                results = list(iter_batch_audio_features(clips, archive, workers=workers))
+                self.assertEqual([result["key"] for result in results], ["a", "broken", "nested/b"])
+                self.assertIn("error", results[1])
+                with zipfile.ZipFile(archive) as members:
+                    self.assertEqual(members.namelist(), ["a.npy", "nested/b.npy"])
+                    for key, path in (clips[0], clips[2]):
+                        expected = root / "single.npy"
+                        extract_audio_features(path, expected)
+                        self.assertEqual(members.read(f"{key}.npy"), expected.read_bytes())
+            self.assertEqual(sorted(item.name for item in root.iterdir()), ["clips", "features_1.npz", "features_2.npz", "single.npy"])
+
+    def test_batch_main_reports_metrics_and_rejects_duplicate_names(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            (root / "other").mkdir()
+            self.write_sine_wav(root / "take.wav")
+            self.write_sine_wav(root / "other" / "take.wav")
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertEqual(main([str(root / "take.wav"), "--output", str(root / "out.npz"), "--workers", "1"]), 0)
+            printed = stdout.getvalue()
+            self.assertIn("METRIC: batch_clip key=take rows=", printed)
+            self.assertIn("METRIC: batch_preprocess_completed", printed)
+            self.assertIn("clips=1 failed=0", printed)
+            with self.assertRaises(ValueError):
+                collect_batch_clips([root / "take.wav", root / "other"])
+
+    def test_iter_feature_rows_skips_gap_when_hop_exceeds_window(self) -> None:
+        samples = [float(i % 7) - 3.0 for i in range(1000)]
+        whole = compute_window_features(samples, sample_rate=1000, window_ms=20.0, hop_ms=50.0, engine="python")
+        blocks = [samples[i : i + 33] for i in range(0, len(samples), 33)]
+        streamed = [
+            row
+            for rows in iter_feature_rows(blocks, 1000, window_ms=20.0, hop_ms=50.0, engine="python")
+            for row in rows
+        ]
+        self.assertEqual(len(whole), 20)
+        self.assertEqual(streamed, whole)
+
+    def test_read_wav_mono_float32_stereo(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "float.wav"
+            payload = struct.pack("<6f", 0.5, 0.25, -1.0, 0.0, 0.125, 0.125)
+            self.write_raw_wav(path, format_tag=3, channels=2, sample_width=4, payload=payload)
+
+            info = read_wav_info(path)
+            self.assertEqual(info.sample_format, "float")
+            self.assertEqual(info.frame_count, 3)
+            sample_rate, samples = read_wav_mono(path)
+            self.assertEqual(sample_rate, 16000)
+            self.assertEqual(samples, [0.375, -0.5, 0.125])
+
+    def test_read_wav_mono_pcm24(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "pcm24.wav"
+            payload = b"\x00\x00\x40" + b"\x00\x00\x80" + b"\xff\xff\xff"
+            self.write_raw_wav(path, format_tag=1, channels=1, sample_width=3, payload=payload)
+
+            _, samples = read_wav_mono(path)
+            self.assertEqual(samples, [0.5, -1.0, -1.0 / 8388608.0])
+            rows = extract_audio_features(path, Path(tmp_dir) / "features.npy")
+            self.assertEqual(rows, 1)
+
+    def test_read_wav_rejects_unsupported_sample_width(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "odd.wav"
+            self.write_raw_wav(path, format_tag=1, channels=1, sample_width=5, payload=b"\x00" * 10)
+            with self.assertRaisesRegex(ValueError, "Unsupported WAV sample width"):
+                read_wav_mono(path)
+
+    def test_resolve_feature_engine_rejects_unknown(self) -> None:
+        with self.assertRaises(ValueError):
+            resolve_feature_engine("cuda")
+        self.assertIn(resolve_feature_engine("auto"), ("numpy", "python"))
+
+    def test_detect_silent_segments_drops_short_runs(self) -> None:
+        rms = [0.0, 0.0, 0.0, 0.5, 0.0, 0.5, 0.0, 0.0, 0.0, 0.0]
+        self.assertEqual(detect_silent_segments(rms, threshold=0.01, min_rows=3), [[0, 3], [6, 10]])
+        self.assertEqual(detect_silent_segments([], threshold=0.01, min_rows=1), [])
+
+    def test_build_voice_activity_writes_segment_map(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            features = root / "audio_features.npy"
+            write_npy_f32_matrix(features, [[0.0, 0.0, 0.0]] * 4 + [[0.3, 0.1, 0.2]] * 2)
+            output_json = root / "voice_activity.json"
+
+            self.assertEqual(build_voice_activity(features, output_json, min_silent_rows=2), 1)
+            payload = json.loads(output_json.read_text(encoding="utf-8"))
+            self.assertEqual(payload["rows"], 6)
+            self.assertEqual(payload["silent_segments"], [[0, 4]])
+
     def test_build_mouth_landmarks_writes_json(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             root = Path(tmp_dir)
@@ -71,6 +447,15 @@ class PreprocessTest(unittest.TestCase):
             self.assertEqual(payload[0]["frame_index"], 0)
             self.assertEqual(len(payload[0]["points"]), 4)
 
+            self.assertEqual(read_npy_header(root / "mouth_landmarks.npy")[:2], ("<f8", (8, 4, 2)))
+            track = LandmarkTrack.from_npy(root / "mouth_landmarks.npy")
+            for frame_index in (0, 5):
+                base = track.base(frame_index)
+                self.assertEqual(
+                    [[track.xs[base + point], track.ys[base + point]] for point in range(4)],
+                    payload[frame_index]["points"],
+                )
+
     def test_get_image_size_png(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             path = Path(tmp_dir) / "face.png"
@@ -78,6 +463,46 @@ class PreprocessTest(unittest.TestCase):
             size = get_image_size(path)
             self.assertEqual(size, (1, 1))
 
+    def test_get_image_size_jpeg_skips_segments_to_any_sof(self) -> None:
+        app0 = b"\xff\xe0" + (16).to_bytes(2, "big") + b"JFIF\x00" + bytes(9)
+        dqt = b"\xff\xdb" + (67).to_bytes(2, "big") + bytes(65)
+        dht = b"\xff\xc4" + (5).to_bytes(2, "big") + bytes(3)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "face.jpg"
+            for sof in (0xC0, 0xC2, 0xC9):
+                frame = bytes([0xFF, 0xFF, sof]) + (11).to_bytes(2, "big") + b"\x08"
+                frame += (480).to_bytes(2, "big") + (640).to_bytes(2, "big") + b"\x01\x01\x11\x00"
+                path.write_bytes(b"\xff\xd8" + app0 + dqt + dht + frame + b"\xff\xda" + bytes(4096))
+                self.assertEqual(get_image_size(path), (640, 480))
+
+    def test_get_image_size_bmp_and_webp(self) -> None:
+        bmp = b"BM" + bytes(12) + (40).to_bytes(4, "little")
+        bmp += (33).to_bytes(4, "little") + (-17).to_bytes(4, "little", signed=True) + bytes(16)
+        vp8 = b"RIFF" + bytes(4) + b"WEBPVP8 " + bytes(7) + b"\x9d\x01\x2a"
+        vp8 += (300).to_bytes(2, "little") + (200).to_bytes(2, "little") + bytes(4)
+        bits = (300 - 1) | ((200 - 1) << 14)
+        vp8l = b"RIFF" + bytes(4) + b"WEBPVP8L" + bytes(4) + b"\x2f" + bits.to_bytes(4, "little") + bytes(8)
+        vp8x = b"RIFF" + bytes(4) + b"WEBPVP8X" + bytes(8) + (299).to_bytes(3, "little") + (199).to_bytes(3, "little")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            (root / "face.bmp").write_bytes(bmp)
+            self.assertEqual(get_image_size(root / "face.bmp"), (33, 17))
+            for name, payload in (("a.webp", vp8), ("b.webp", vp8l), ("c.webp", vp8x)):
+                (root / name).write_bytes(payload)
+                self.assertEqual(get_image_size(root / name), (300, 200), name)
+
+    def test_get_image_size_memo_follows_file_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "face.png"
+            path.write_bytes(TINY_PNG)
+            self.assertEqual(get_image_size(path), (1, 1))
+            resized = TINY_PNG[:16] + (7).to_bytes(4, "big") + (5).to_bytes(4, "big") + TINY_PNG[24:] + bytes(8)
+            path.write_bytes(resized)
+            self.assertEqual(get_image_size(path), (7, 5))
+            path.write_bytes(b"not an image")
+            with self.assertRaises(ValueError):
+                get_image_size(path)
+
 
 if __name__ == "__main__":
     unittest.main()
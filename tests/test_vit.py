@@ -39,6 +39,17 @@ class VitTest(unittest.TestCase):
             self.assertEqual(result.backend_used, "vit-mock")
             self.assertEqual(result.details["reference_count"], 2.0)
 
+            parallel = compute_mock_vit_conditioning(
+                image,
+                width=128,
+                height=128,
+                patch_size=16,
+                reference_images=[side],
+                decode_workers=2,
+            )
+            self.assertEqual(parallel.conditioning, result.conditioning)
+            self.assertEqual([record["path"] for record in parallel.reference_decode], [str(image), str(side)])
+
     def test_resolve_heuristic(self) -> None:
         with tempfile.TemporaryDirectory() as tmp_dir:
             image = Path(tmp_dir) / "face.png"